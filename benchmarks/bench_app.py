@@ -0,0 +1,255 @@
+"""
+Application benchmark: drives the hot views through the test client
+against a generated database and compares p50/p95 latency, SQL query
+counts and peak memory with the baselines in benchmarks/baselines.json.
+The run fails (exit 1) on a regression.
+
+The listing render cache is disabled so every request does the full work.
+Memory is measured in a separate, shorter pass because tracemalloc slows
+everything down. No .env is needed:
+
+    python -m benchmarks.bench_app [--iterations 50] [--notes 100000]
+    python -m benchmarks.bench_app --update-baselines
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.datagen import (
+    ADMIN_NAME,
+    BENCH_PASSWORD,
+    VOLUMES,
+    create_bench_app,
+    generate,
+)
+
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+SEARCH_TERMS = ("hearing", "Petrov", "evidence", "Kazan", "ruling", "Orlova")
+CASE_PREFIXES = ("Contract", "Ivan", "+7 999 00", "Debt", "Maria", "Tax")
+MEMORY_ITERATIONS = 5
+
+
+def _home(client, data, rng):
+    return client.get("/")
+
+
+def _search(client, data, rng):
+    return client.get("/search", query_string={"search": rng.choice(SEARCH_TERMS)})
+
+
+def _search_cases(client, data, rng):
+    return client.post("/search-cases", data={"search": rng.choice(CASE_PREFIXES)})
+
+
+def _new_note(client, data, rng):
+    return client.post(
+        "/new-note",
+        data={
+            "case_id": str(rng.choice(data["case_ids"])),
+            "court_id": str(rng.choice(data["court_ids"])),
+            "status": "pending",
+            "details": "Benchmark hearing",
+            "date": "2025-03-14",
+            "time": "10:30",
+        },
+    )
+
+
+def _upload_file(client, data, rng):
+    content = rng.randbytes(64 * 1024)
+    return client.post(
+        f"/upload-file/{rng.choice(data['case_ids'])}",
+        data={"file": (io.BytesIO(content), "bench.pdf")},
+        content_type="multipart/form-data",
+    )
+
+
+def _download_file(client, data, rng):
+    response = client.get(f"/download-file/{rng.choice(data['file_ids'])}")
+    response.get_data()
+    return response
+
+
+# name -> (view, expected status)
+SCENARIOS = {
+    "home": (_home, 200),
+    "search": (_search, 200),
+    "search_cases": (_search_cases, 200),
+    "new_note": (_new_note, 200),
+    "upload_file": (_upload_file, 302),
+    "download_file": (_download_file, 200),
+}
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _login(app):
+    client = app.test_client()
+    client.post("/login", data={"name": ADMIN_NAME, "password": BENCH_PASSWORD})
+    # Consume the login flash so listings are not rendered around it.
+    client.get("/storage-info")
+    return client
+
+
+def _call(scenario, client, data, rng):
+    view, status = SCENARIOS[scenario]
+    response = view(client, data, rng)
+    if response.status_code != status:
+        raise RuntimeError(f"{scenario}: expected {status}, got {response.status_code}")
+    return int(response.headers.get("X-Query-Count", 0))
+
+
+def measure(app, data, scenario, iterations, warmup):
+    client = _login(app)
+    rng = random.Random(scenario)
+    for _ in range(warmup):
+        _call(scenario, client, data, rng)
+
+    latencies = []
+    queries = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        queries.append(_call(scenario, client, data, rng))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    for _ in range(MEMORY_ITERATIONS):
+        _call(scenario, client, data, rng)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024),
+    }
+
+
+def regressions(results, baselines, tolerance, memory_tolerance):
+    """Human readable problems, one per scenario metric over its baseline"""
+    problems = []
+    for scenario, result in results.items():
+        baseline = baselines.get(scenario)
+        if baseline is None:
+            continue
+        if result["p95_ms"] > baseline["p95_ms"] * (1 + tolerance):
+            problems.append(
+                f"{scenario}: p95 {result['p95_ms']}ms, baseline {baseline['p95_ms']}ms"
+            )
+        if result["queries"] > baseline["queries"]:
+            problems.append(
+                f"{scenario}: {result['queries']} queries, baseline {baseline['queries']}"
+            )
+        if result["peak_kb"] > baseline["peak_kb"] * (1 + memory_tolerance):
+            problems.append(
+                f"{scenario}: peak {result['peak_kb']}KB, baseline {baseline['peak_kb']}KB"
+            )
+    return problems
+
+
+def _bench_data(app):
+    from sqlalchemy import select
+
+    from website import db
+    from website.models import Case, CaseFile, Court
+
+    with app.app_context():
+        return {
+            "case_ids": list(db.session.execute(select(Case.id)).scalars()),
+            "court_ids": list(db.session.execute(select(Court.id)).scalars()),
+            "file_ids": list(db.session.execute(select(CaseFile.id)).scalars()),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="allowed p95 slowdown over the baseline (0.5 = 50%%)",
+    )
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    parser.add_argument("--update-baselines", action="store_true")
+    for name, default in VOLUMES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    args = parser.parse_args()
+    volumes = {name: getattr(args, name) for name in VOLUMES}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_bench_app(workdir)
+        started = time.perf_counter()
+        generate(app, **volumes)
+        print(f"Generated {volumes} in {time.perf_counter() - started:.1f}s")
+
+        from website.rendercache import RenderCache
+
+        app.extensions["render_cache"] = RenderCache(0)
+        data = _bench_data(app)
+
+        results = {}
+        for scenario in args.scenarios:
+            results[scenario] = measure(
+                app, data, scenario, args.iterations, args.warmup
+            )
+            result = results[scenario]
+            print(
+                f"{scenario:<14} p50 {result['p50_ms']:8.2f}ms"
+                f"  p95 {result['p95_ms']:8.2f}ms"
+                f"  {result['queries']:3d} queries"
+                f"  peak {result['peak_kb']:7d}KB"
+            )
+
+    if args.update_baselines:
+        with open(BASELINES_PATH, "w") as baselines_file:
+            json.dump(
+                {
+                    "volumes": volumes,
+                    "python": platform.python_version(),
+                    "scenarios": results,
+                },
+                baselines_file,
+                indent=2,
+            )
+            baselines_file.write("\n")
+        print(f"Baselines written to {BASELINES_PATH}")
+        return
+
+    if not os.path.exists(BASELINES_PATH):
+        print("No baselines yet; run with --update-baselines.")
+        return
+    with open(BASELINES_PATH) as baselines_file:
+        stored = json.load(baselines_file)
+    if stored["volumes"] != volumes:
+        print(f"Baselines were recorded with {stored['volumes']}; not comparing.")
+        sys.exit(2)
+
+    problems = regressions(
+        results, stored["scenarios"], args.tolerance, args.memory_tolerance
+    )
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+    print("No regressions against the stored baselines.")
+
+
+if __name__ == "__main__":
+    main()
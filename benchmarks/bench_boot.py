@@ -0,0 +1,127 @@
+"""
+Worker boot benchmark: how long gunicorn takes to bring every worker up,
+and to replace a worker that died (or was recycled by max_requests).
+
+"legacy" runs gunicorn the way the Dockerfile used to (no config file,
+every worker imports the app itself); "configured" runs it with
+gunicorn.conf.py. Run from the repository root (no .env needed):
+
+    python -m benchmarks.bench_boot [--workers 3] [--respawns 5]
+"""
+import argparse
+import os
+import queue
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+QUIET_ENV = {
+    "MAIL_WORKER": "0",
+    "STORAGE_RECONCILE_INTERVAL": "0",
+}
+
+# The legacy command had no hooks, so this config only reports readiness.
+PROBE_CONFIG = """
+def post_worker_init(worker):
+    worker.log.info("Worker ready (pid: %s)", worker.pid)
+"""
+
+BOOTING_RE = re.compile(r"Booting worker with pid: (\d+)")
+READY_RE = re.compile(r"Worker ready \(pid: (\d+)\)")
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _follow(stream, lines):
+    for line in stream:
+        lines.put((time.perf_counter(), line))
+
+
+def _wait_ready(lines, count, timeout=60):
+    """Return (time the last of `count` workers was ready, their pids)"""
+    pids = []
+    deadline = time.perf_counter() + timeout
+    while len(pids) < count:
+        stamp, line = lines.get(timeout=max(deadline - time.perf_counter(), 0.1))
+        match = READY_RE.search(line)
+        if match:
+            pids.append(int(match.group(1)))
+    return stamp, pids
+
+
+def run(profile, workers, respawns, workdir):
+    env = dict(os.environ, **QUIET_ENV)
+    # main:app reads its secret from the environment; a real one is not needed.
+    env["SECRET_KEY"] = env.get("SECRET_KEY") or "bench"
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'{profile}.db')}"
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "--bind",
+        f"127.0.0.1:{_free_port()}",
+        "--workers",
+        str(workers),
+    ]
+    if profile == "legacy":
+        probe = os.path.join(workdir, "probe.conf.py")
+        with open(probe, "w") as config:
+            config.write(PROBE_CONFIG)
+        command += ["--config", probe]
+    else:
+        command += ["--config", "gunicorn.conf.py"]
+    command.append("main:app")
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        command, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True
+    )
+    lines = queue.Queue()
+    threading.Thread(target=_follow, args=(server.stderr, lines), daemon=True).start()
+    try:
+        ready, pids = _wait_ready(lines, workers)
+        cold = ready - started
+
+        replacements = []
+        for _ in range(respawns):
+            killed = time.perf_counter()
+            os.kill(pids.pop(0), signal.SIGKILL)
+            ready, new_pids = _wait_ready(lines, 1)
+            replacements.append(ready - killed)
+            pids += new_pids
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return cold, replacements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--respawns", type=int, default=5)
+    parser.add_argument("--profiles", nargs="+", default=["legacy", "configured"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in args.profiles:
+            cold, replacements = run(profile, args.workers, args.respawns, workdir)
+            print(
+                f"{profile:>10}: {args.workers} workers ready in {cold * 1000:7.1f}ms,"
+                f" replacement worker ready in"
+                f" {statistics.median(replacements) * 1000:6.1f}ms (median)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Concurrency benchmark: several worker processes reading and writing notes
+against one SQLite file, once with SQLite's defaults and once with the
+production pragmas from website/database.py.
+
+Each worker is a separate process with its own app and engine, like a
+gunicorn worker. A quarter of its operations insert a note; the rest read
+a keyset page of notes. Run from the repository root (no .env needed):
+
+    python -m benchmarks.bench_concurrency [--workers 3] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import date, time as clock
+
+
+PROFILES = {
+    "default": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT": "0",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+    },
+    "tuned": {},
+}
+
+QUIET_ENV = {
+    "MAIL_WORKER": "0",
+    "STORAGE_RECONCILE_INTERVAL": "0",
+}
+
+
+def _create_app(database_path, profile):
+    os.environ.update(QUIET_ENV)
+    os.environ.update(PROFILES[profile])
+    from benchmarks.datagen import create_bench_app
+
+    return create_bench_app(
+        os.path.dirname(database_path), f"sqlite:///{database_path}"
+    )
+
+
+def _seed(database_path, profile):
+    app = _create_app(database_path, profile)
+    from website import db
+    from website.models import Case, Court, User
+
+    with app.app_context():
+        creator = User.query.filter_by(name="admin").first()
+        case = Case(
+            title="Bench",
+            details="Bench",
+            full_name="Bench Client",
+            phone="000",
+            creator_id=creator.id,
+        )
+        court = Court(title="Bench Court", address="Bench")
+        db.session.add_all([case, court])
+        db.session.commit()
+        return case.id, court.id, creator.id
+
+
+def _worker(database_path, profile, seconds, ids, results):
+    app = _create_app(database_path, profile)
+    from website import db
+    from website.models import Note
+    from website.pagination import paginate_keyset
+
+    case_id, court_id, creator_id = ids
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < 0.25:
+                    db.session.add(
+                        Note(
+                            client_name="Bench Client",
+                            case_title="Bench",
+                            court_address="Bench",
+                            court_name="Bench Court",
+                            details="bench",
+                            date=date(2024, 1, random.randint(1, 28)),
+                            time=clock(random.randint(8, 18), 0),
+                            status="pending",
+                            case_id=case_id,
+                            court_id=court_id,
+                            creator_id=creator_id,
+                        )
+                    )
+                    db.session.commit()
+                    writes += 1
+                else:
+                    paginate_keyset(
+                        Note.query, (Note.date, Note.time, Note.id), page_size=50
+                    )
+                    db.session.rollback()
+                    reads += 1
+            except Exception:
+                db.session.rollback()
+                errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(profile, workers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "bench.db")
+        context = multiprocessing.get_context("spawn")
+        seeder = context.Pool(1)
+        ids = seeder.apply(_seed, (database_path, profile))
+        seeder.close()
+        seeder.join()
+
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=_worker, args=(database_path, profile, seconds, ids, results)
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    reads = sum(total[0] for total in totals)
+    writes = sum(total[1] for total in totals)
+    errors = sum(total[2] for total in totals)
+    print(
+        f"{profile:<8} {workers} workers: "
+        f"{reads / seconds:8.0f} reads/s  {writes / seconds:7.0f} writes/s  "
+        f"{errors} errors"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    for profile in PROFILES:
+        run(profile, args.workers, args.seconds)
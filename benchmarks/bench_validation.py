@@ -0,0 +1,141 @@
+"""
+Micro-benchmark: the per-field boolean chains the routes used to run against
+the precompiled NOTE_SCHEMA / CASE_SCHEMA validators. Only form checking
+is timed; the old new_case also ran its duplicate query before validating.
+
+Run from the repository root (no .env needed):
+
+    python -m benchmarks.bench_validation
+"""
+import re
+import timeit
+from datetime import datetime
+
+from website.utils import SQL_PATTERNS, is_valid_range
+from website.validation import CASE_SCHEMA, NOTE_SCHEMA
+
+
+NOTE_FORM = {
+    "case_id": "42",
+    "court_id": "7",
+    "status": "pending",
+    "details": "Hearing moved to the afternoon session",
+    "date": "2024-05-17",
+    "time": "14:30",
+}
+
+CASE_FORM = {
+    "title": "Contract dispute",
+    "details": "Supplier failed to deliver",
+    "full_name": "Ivan Petrov",
+    "phone": "+7 900 000 00 00",
+}
+
+
+# The helpers and form checks below are copied from website/utils.py and
+# the new_note / new_case routes as they were before the schemas, so the
+# comparison measures the code that actually ran.
+legacy_allowed_status = {"resolved": True, "pending": True, "rejected": True}
+
+
+def legacy_has_sql_injection(input_string):
+    return any(re.search(pattern, input_string) for pattern in SQL_PATTERNS)
+
+
+def legacy_is_number(value):
+    if isinstance(value, str):
+        return value.isdigit()
+    return False
+
+
+def legacy_is_valid_date(date_str):
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def legacy_is_valid_time(time_str):
+    try:
+        datetime.strptime(time_str, "%H:%M:%S")
+        return True
+    except ValueError:
+        try:
+            datetime.strptime(time_str, "%H:%M")
+            return True
+        except ValueError:
+            return False
+
+
+def legacy_note(form):
+    case_id = form.get("case_id")
+    court_id = form.get("court_id")
+    status = form.get("status")
+    date_str = form.get("date")
+    time_str = form.get("time")
+
+    if (
+        not case_id
+        or not legacy_is_number(case_id)
+        or not court_id
+        or not legacy_is_number(court_id)
+        or not status
+        or not legacy_allowed_status.get(status)
+        or not date_str
+        or not legacy_is_valid_date(date_str)
+        or not time_str
+        or not legacy_is_valid_time(time_str)
+    ):
+        return None
+    # The route then parsed both strings again to build the Note.
+    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    time = datetime.strptime(time_str, "%H:%M").time()
+    return date, time
+
+
+def legacy_case(form):
+    title = form.get("title")
+    details = form.get("details")
+    full_name = form.get("full_name")
+    phone = form.get("phone")
+    return not (
+        not title
+        or not is_valid_range(title, 100)
+        or legacy_has_sql_injection(title)
+        or not details
+        or not is_valid_range(details, 100)
+        or legacy_has_sql_injection(details)
+        or not full_name
+        or not is_valid_range(full_name, 100)
+        or legacy_has_sql_injection(full_name)
+        or not phone
+        or not is_valid_range(phone, 20)
+        or legacy_has_sql_injection(phone)
+    )
+
+
+def report(label, legacy, schema, number):
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=5))
+    schema_time = min(timeit.repeat(schema, number=number, repeat=5))
+    print(
+        f"{label:<6} legacy {legacy_time / number * 1e6:8.2f} us  "
+        f"schema {schema_time / number * 1e6:8.2f} us  "
+        f"x{legacy_time / schema_time:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    number = 20000
+    report(
+        "note",
+        lambda: legacy_note(NOTE_FORM),
+        lambda: NOTE_SCHEMA.validate(NOTE_FORM),
+        number,
+    )
+    report(
+        "case",
+        lambda: legacy_case(CASE_FORM),
+        lambda: CASE_SCHEMA.validate(CASE_FORM),
+        number,
+    )
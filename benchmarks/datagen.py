@@ -0,0 +1,287 @@
+"""
+Synthetic data generator: users, courts, cases, notes and case files in
+realistic proportions, inserted with chunked executemany statements.
+
+Data is deterministic for a given --seed. Case files share a small pool of
+blobs that are written to the upload folder, so downloads work. Seed a
+throwaway database (no .env needed) with:
+
+    python -m benchmarks.datagen /tmp/bench [--notes 100000]
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+from datetime import date, datetime, time as clock, timedelta
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+
+VOLUMES = {
+    "users": 25,
+    "courts": 300,
+    "cases": 10_000,
+    "notes": 100_000,
+    "files": 5_000,
+}
+
+CHUNK_SIZE = 5_000
+BLOB_POOL_SIZE = 64
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_NAME = "bench-admin"
+
+FIRST_NAMES = """
+    Ivan Maria Alexei Olga Dmitry Anna Sergei Elena Nikolai Tatiana Pavel
+    Irina Mikhail Natalia Andrei
+""".split()
+LAST_NAMES = """
+    Petrov Ivanova Smirnov Kuznetsova Popov Volkova Sokolov Lebedeva Kozlov
+    Novikova Morozov Orlova
+""".split()
+MATTERS = (
+    "Contract dispute",
+    "Lease termination",
+    "Debt recovery",
+    "Divorce",
+    "Inheritance",
+    "Labour claim",
+    "Insurance claim",
+    "Property boundary",
+    "Consumer complaint",
+    "Tax appeal",
+    "Custody",
+    "Defamation",
+)
+CITIES = """
+    Moscow Kazan Samara Tver Omsk Perm Ufa Tula
+""".split()
+COURT_KINDS = ("District", "Arbitration", "Regional", "Magistrate", "Appeals")
+STREETS = ("Lenina", "Mira", "Sadovaya", "Gagarina", "Pushkina", "Sovetskaya")
+DETAILS = (
+    "Preliminary hearing",
+    "Witness examination",
+    "Submission of evidence",
+    "Expert report review",
+    "Settlement talks",
+    "Closing arguments",
+    "Hearing postponed",
+    "Ruling announced",
+)
+# Most hearings are still open; resolved ones pile up in the past.
+STATUSES = ("pending", "resolved", "rejected")
+STATUS_WEIGHTS = (6, 3, 1)
+EXTENSIONS = ("pdf", "docx", "jpg", "png", "txt")
+
+
+def _insert_chunks(connection, table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(insert(table), rows[start : start + CHUNK_SIZE])
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _write_blob_pool(rng, upload_folder, count):
+    """Write `count` blobs to the blob store and return [(sha256, size)]"""
+    from website.blobs import blob_path
+
+    pool = []
+    for _ in range(count):
+        content = rng.randbytes(rng.randint(2_000, 200_000))
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = os.path.join(upload_folder, blob_path(sha256))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            target.write(content)
+        pool.append((sha256, len(content)))
+    return pool
+
+
+def generate(app, seed=0, **volumes):
+    """
+    Add synthetic rows to a fresh database and return the row counts.
+    `volumes` overrides VOLUMES by key. Every generated user has the
+    password BENCH_PASSWORD; the first one, ADMIN_NAME, is an admin.
+    """
+    from website import db
+    from website.blobs import blob_path
+    from website.models import Blob, Case, CaseFile, Court, Note, User
+    from website.storage import reconcile_storage_usage
+
+    volumes = dict(VOLUMES, **volumes)
+    rng = random.Random(seed)
+    today = date.today()
+    # One hash for everyone; scrypt per user would dominate the run.
+    password = generate_password_hash(BENCH_PASSWORD, method="scrypt")
+    created = datetime.utcnow()
+
+    with app.app_context(), db.engine.begin() as connection:
+        first_case = connection.execute(select(func.max(Case.id))).scalar() or 0
+
+        _insert_chunks(
+            connection,
+            User,
+            [
+                {
+                    "name": ADMIN_NAME if n == 0 else f"bench-user-{n}",
+                    "email": f"bench-{n}@example.com",
+                    "password": password,
+                    "is_active": True,
+                    "is_admin": n == 0,
+                    "date_created": created,
+                }
+                for n in range(volumes["users"])
+            ],
+        )
+        user_ids = list(
+            connection.execute(
+                select(User.id).where(User.name.like("bench-%"))
+            ).scalars()
+        )
+
+        _insert_chunks(
+            connection,
+            Court,
+            [
+                {
+                    "title": f"{rng.choice(CITIES)} {rng.choice(COURT_KINDS)} "
+                    f"Court No. {n + 1}",
+                    "address": f"{rng.choice(STREETS)} st. {rng.randint(1, 200)}",
+                }
+                for n in range(volumes["courts"])
+            ],
+        )
+        courts = connection.execute(select(Court.id, Court.title, Court.address)).all()
+
+        _insert_chunks(
+            connection,
+            Case,
+            [
+                {
+                    "title": f"{rng.choice(MATTERS)} #{first_case + n + 1}",
+                    "details": rng.choice(DETAILS),
+                    "full_name": _person(rng),
+                    # Phones are unique; keep them clear of real numbers.
+                    "phone": f"+7 999 {first_case + n + 1:07d}",
+                    "creator_id": rng.choice(user_ids),
+                }
+                for n in range(volumes["cases"])
+            ],
+        )
+        cases = connection.execute(
+            select(Case.id, Case.title, Case.full_name, Case.creator_id).where(
+                Case.id > first_case
+            )
+        ).all()
+
+        notes = []
+        for _ in range(volumes["notes"]):
+            case = rng.choice(cases)
+            court = rng.choice(courts)
+            notes.append(
+                {
+                    "client_name": case.full_name,
+                    "case_title": case.title,
+                    "court_address": court.address,
+                    "court_name": court.title,
+                    "details": rng.choice(DETAILS),
+                    "date": today + timedelta(days=rng.randint(-365, 180)),
+                    "time": clock(rng.randint(8, 17), rng.choice((0, 30))),
+                    "status": rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                    "case_id": case.id,
+                    "court_id": court.id,
+                    # Mostly the case owner's notes, sometimes a colleague's.
+                    "creator_id": case.creator_id
+                    if rng.random() < 0.8
+                    else rng.choice(user_ids),
+                }
+            )
+        _insert_chunks(connection, Note, notes)
+
+        pool = _write_blob_pool(
+            rng,
+            app.config["UPLOAD_FOLDER"],
+            min(BLOB_POOL_SIZE, volumes["files"]),
+        )
+        files = []
+        references = {}
+        for n in range(volumes["files"]):
+            sha256, size = rng.choice(pool)
+            references[sha256] = references.get(sha256, 0) + 1
+            files.append(
+                {
+                    "filename": blob_path(sha256),
+                    "original_filename": f"document-{n + 1}.{rng.choice(EXTENSIONS)}",
+                    "file_size": size,
+                    "upload_date": created,
+                    "case_id": rng.choice(cases).id,
+                    "sha256": sha256,
+                }
+            )
+        _insert_chunks(
+            connection,
+            Blob,
+            [
+                {
+                    "sha256": sha256,
+                    "size": size,
+                    "ref_count": references[sha256],
+                    "created_at": created,
+                }
+                for sha256, size in pool
+                if sha256 in references
+            ],
+        )
+        _insert_chunks(connection, CaseFile, files)
+
+    with app.app_context():
+        reconcile_storage_usage()
+
+    return volumes
+
+
+def create_bench_app(workdir, database_uri=None):
+    """An app on a database and upload folder under `workdir`, no .env needed"""
+    from website import create_app
+
+    uploads = os.path.join(workdir, "uploads")
+    os.makedirs(uploads, exist_ok=True)
+    return create_app(
+        {
+            "SECRET_KEY": "bench",
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": database_uri
+            or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "UPLOAD_FOLDER": uploads,
+        },
+        instance_path=os.path.join(workdir, "instance"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("workdir", help="directory for bench.db and uploads/")
+    parser.add_argument("--seed", type=int, default=0)
+    for name, default in VOLUMES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    app = create_bench_app(workdir)
+    started = time.perf_counter()
+    counts = generate(
+        app, seed=args.seed, **{name: getattr(args, name) for name in VOLUMES}
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        ", ".join(f"{count} {name}" for name, count in counts.items())
+        + f" in {elapsed:.1f}s ({workdir})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+gunicorn settings for the production container:
+
+    gunicorn --config gunicorn.conf.py main:app
+
+The app is imported once in the master (preload_app), so migrations, the
+admin check and the other one-time startup work run once per deploy and
+workers are forked ready to serve. Everything is tunable from the
+environment; see the GUNICORN_* variables in .env.example.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+
+bind = os.getenv("GUNICORN_BIND") or "127.0.0.1:8000"
+
+# "sync" handles one request per worker; "gthread" adds threads per worker,
+# which suits slow clients on uploads and downloads better.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS") or "sync"
+threads = int(os.getenv("GUNICORN_THREADS") or (4 if worker_class == "gthread" else 1))
+
+_cpus = multiprocessing.cpu_count()
+workers = int(
+    os.getenv("GUNICORN_WORKERS")
+    or (_cpus + 1 if worker_class == "gthread" else _cpus * 2 + 1)
+)
+
+# Recycle workers now and then to bound slow leaks; the jitter keeps them
+# from all restarting at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS") or 1000)
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER") or 100)
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or 60)
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT") or 30)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE") or 5)
+
+preload_app = (os.getenv("GUNICORN_PRELOAD") or "1") == "1"
+
+# Workers write metrics to files here so /metrics adds up every process.
+# Without PROMETHEUS_MULTIPROC_DIR the config owns a directory named after
+# the master pid, which stays the same when a HUP reloads this file.
+_owns_metrics_dir = not os.getenv("PROMETHEUS_MULTIPROC_DIR")
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.path.join(
+    tempfile.gettempdir(), f"lawyers-metrics-{os.getpid()}"
+)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# Applied before the app is loaded. BACKGROUND_JOBS keeps the master from
+# starting the mail and storage threads, which post_worker_init starts in
+# each worker; prometheus_client picks its mode when it is imported.
+raw_env = [
+    "BACKGROUND_JOBS=post_fork",
+    f"PROMETHEUS_MULTIPROC_DIR={metrics_dir}",
+]
+
+
+def on_starting(server):
+    # Runs once per server, not on reload. Samples left in our own directory
+    # are stale; a directory the operator supplied is theirs to manage.
+    if _owns_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+
+def on_exit(server):
+    if _owns_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def when_ready(server):
+    # The master never queries the database again; close what startup used
+    # so no connection is shared with the forked workers.
+    if preload_app:
+        from website import db
+
+        with server.app.wsgi().app_context():
+            db.engine.dispose()
+
+
+def post_worker_init(worker):
+    from website import db
+    from website.background import start_background_jobs
+
+    app = worker.wsgi
+    with app.app_context():
+        # Drop any pooled connection inherited from the master without
+        # closing it underneath the other processes.
+        db.engine.dispose(close=False)
+    start_background_jobs(app)
+    worker.log.info("Worker ready (pid: %s)", worker.pid)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from website import create_app, db
+from website.rendercache import RenderCache
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a throwaway SQLite database and upload folder"""
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    app = create_app(
+        {
+            "SECRET_KEY": "test",
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "UPLOAD_FOLDER": str(uploads),
+        },
+        instance_path=os.path.join(tmp_path, "instance"),
+    )
+    # Every request should run its queries, not replay a cached fragment.
+    app.extensions["render_cache"] = RenderCache(0)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,55 @@
+import re
+
+from benchmarks.datagen import ADMIN_NAME, BENCH_PASSWORD, generate
+from website.models import OutboxEmail
+
+LINK_RE = re.compile(r'href="http://localhost(/set-password/[^"]+)"')
+
+
+def create_user(app, email):
+    """Create a user as the admin and return the path of their emailed link"""
+    generate(app, users=1, courts=0, cases=0, notes=0, files=0)
+    client = app.test_client()
+    client.post("/login", data={"name": ADMIN_NAME, "password": BENCH_PASSWORD})
+    response = client.post("/create-user", data={"email": email})
+    assert response.status_code == 302
+    with app.app_context():
+        body = OutboxEmail.query.filter_by(recipient=email).one().body
+    assert "Password:" not in body
+    return LINK_RE.search(body).group(1)
+
+
+def test_new_user_sets_password_through_emailed_link(app):
+    link = create_user(app, "new.user@example.com")
+    client = app.test_client()
+    assert client.get(link).status_code == 200
+
+    mismatch = client.post(link, data={"password": "s3cret-pass", "confirm": "other"})
+    assert mismatch.status_code == 200
+    assert b"Passwords do not match." in mismatch.data
+
+    response = client.post(
+        link, data={"password": "s3cret-pass", "confirm": "s3cret-pass"}
+    )
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/login")
+
+    login = client.post("/login", data={"name": "new.user", "password": "s3cret-pass"})
+    assert login.headers["Location"].endswith("/")
+
+
+def test_set_password_link_works_once(app):
+    link = create_user(app, "once@example.com")
+    client = app.test_client()
+    client.post(link, data={"password": "first-pass", "confirm": "first-pass"})
+
+    reused = client.get(link)
+    assert reused.status_code == 302
+    assert reused.headers["Location"].endswith("/login")
+
+
+def test_tampered_set_password_link_is_rejected(app):
+    link = create_user(app, "tamper@example.com")
+    response = app.test_client().get(link[:-2] + "xx")
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/login")
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from website import blobs, db
+from website.models import Case, CaseFile
+
+# Two legacy files share content, so deduping frees one copy.
+LEGACY_CONTENTS = (b"alpha", b"beta", b"alpha", b"gamma")
+
+
+@pytest.fixture
+def legacy_files(app):
+    """CaseFile rows uploaded before content addressing, with their paths"""
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    with app.app_context():
+        case = Case(title="Case", details="Details", full_name="Client", phone="1")
+        db.session.add(case)
+        db.session.flush()
+        paths = {}
+        for index, content in enumerate(LEGACY_CONTENTS):
+            filename = f"legacy-{index}.txt"
+            with open(os.path.join(upload_folder, filename), "wb") as f:
+                f.write(content)
+            case_file = CaseFile(
+                filename=filename,
+                original_filename=filename,
+                file_size=len(content),
+                case_id=case.id,
+            )
+            db.session.add(case_file)
+            db.session.flush()
+            paths[case_file.id] = os.path.join(upload_folder, filename)
+        db.session.commit()
+    return paths
+
+
+def blob_files(upload_folder):
+    blob_root = os.path.join(upload_folder, blobs.BLOB_DIR_NAME)
+    return [
+        name
+        for root, _, names in os.walk(blob_root)
+        if blobs.LOCK_DIR_NAME not in root.split(os.sep)
+        for name in names
+    ]
+
+
+def test_error_mid_batch_keeps_legacy_files(app, legacy_files, monkeypatch):
+    hash_file = blobs.hash_file
+    calls = []
+
+    def failing_hash_file(path):
+        calls.append(path)
+        if len(calls) == 3:
+            raise PermissionError(path)
+        return hash_file(path)
+
+    monkeypatch.setattr(blobs, "hash_file", failing_hash_file)
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    with app.app_context():
+        with pytest.raises(PermissionError):
+            blobs.dedupe_legacy_files(upload_folder)
+
+        for case_file in CaseFile.query.all():
+            assert case_file.sha256 is None
+            assert os.path.join(upload_folder, case_file.filename) == (
+                legacy_files[case_file.id]
+            )
+    for path in legacy_files.values():
+        assert os.path.exists(path)
+    assert blob_files(upload_folder) == []
+
+
+def test_dedupe_moves_legacy_files_into_blobs(app, legacy_files):
+    upload_folder = app.config["UPLOAD_FOLDER"]
+    with app.app_context():
+        migrated, freed = blobs.dedupe_legacy_files(upload_folder, batch_size=3)
+        assert (migrated, freed) == (len(LEGACY_CONTENTS), len(b"alpha"))
+
+        for case_file in CaseFile.query.all():
+            assert case_file.sha256 is not None
+            assert os.path.exists(os.path.join(upload_folder, case_file.filename))
+    for path in legacy_files.values():
+        assert not os.path.exists(path)
+    assert len(blob_files(upload_folder)) == len(set(LEGACY_CONTENTS))
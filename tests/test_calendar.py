@@ -0,0 +1,37 @@
+from datetime import date
+
+from benchmarks.datagen import ADMIN_NAME, BENCH_PASSWORD, generate
+from website import schedule
+
+
+class FakeDate(date):
+    current = date(2026, 3, 2)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+def test_default_calendar_etag_changes_with_the_day(app, monkeypatch):
+    generate(app, users=2, courts=5, cases=10, notes=50, files=0)
+    client = app.test_client()
+    client.post("/login", data={"name": ADMIN_NAME, "password": BENCH_PASSWORD})
+    # Consume the login flash; pages with pending flashes skip the ETag.
+    client.get("/")
+
+    monkeypatch.setattr(schedule, "date", FakeDate)
+    first = client.get("/api/calendar")
+    assert first.status_code == 200
+    assert first.get_json()["from"] == "2026-03-02"
+
+    same_day = client.get(
+        "/api/calendar", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert same_day.status_code == 304
+
+    monkeypatch.setattr(FakeDate, "current", date(2026, 3, 3))
+    next_day = client.get(
+        "/api/calendar", headers={"If-None-Match": first.headers["ETag"]}
+    )
+    assert next_day.status_code == 200
+    assert next_day.get_json()["from"] == "2026-03-03"
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from benchmarks.datagen import ADMIN_NAME, BENCH_PASSWORD, generate
+from website import db
+from website.importer import import_rows, read_csv, read_xlsx
+from website.models import Note
+
+READERS = {"csv": read_csv, "xlsx": read_xlsx}
+
+
+@pytest.mark.parametrize("export_format", sorted(READERS))
+def test_exported_notes_import_as_is(app, export_format):
+    generate(app, users=2, courts=10, cases=30, notes=120, files=0)
+    client = app.test_client()
+    client.post("/login", data={"name": ADMIN_NAME, "password": BENCH_PASSWORD})
+    exported = client.get(f"/export/notes.{export_format}")
+    assert exported.status_code == 200
+    # Drain the streamed body before pushing a context of our own.
+    data = exported.get_data()
+
+    with app.app_context():
+        before = sorted(
+            (note.case_id, note.court_id, note.date, note.time, note.details)
+            for note in Note.query
+        )
+        Note.query.delete()
+        db.session.commit()
+
+        rows = READERS[export_format](io.BytesIO(data))
+        report = import_rows("notes", rows, creator_id=1)
+        assert report.errors == []
+        assert report.inserted == len(before)
+
+        after = sorted(
+            (note.case_id, note.court_id, note.date, note.time, note.details)
+            for note in Note.query
+        )
+        assert after == before
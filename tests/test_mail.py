@@ -0,0 +1,169 @@
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from website import db, mail
+from website.models import OutboxEmail
+
+
+class RecordingHandler:
+    """Accepts mail, except 550 for "reject@" and 450 for "busy@" recipients"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject@"):
+            return "550 5.1.1 No such user"
+        if address.startswith("busy@"):
+            return "450 4.2.1 Mailbox busy, try later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(port))
+    monkeypatch.setenv("SMTP_USE_SSL", "0")
+    monkeypatch.setenv("SMTP_STARTTLS", "0")
+    monkeypatch.setenv("SMTP_USERNAME", "")
+    yield handler
+    controller.stop()
+
+
+def enqueue(*recipients):
+    for recipient in recipients:
+        mail.enqueue_email(recipient, "Hearing reminder", "<p>Tomorrow</p>")
+    db.session.commit()
+
+
+def outbox(recipient):
+    return OutboxEmail.query.filter_by(recipient=recipient).one()
+
+
+def make_due(recipient):
+    message = outbox(recipient)
+    message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_delivers_due_messages_over_one_connection(app, smtp_server):
+    with app.app_context():
+        enqueue("a@example.com", "b@example.com", "c@example.com")
+
+        assert mail.deliver_outbox() == (3, 3)
+
+        assert sorted(rcpt for rcpt, _ in smtp_server.messages) == [
+            ["a@example.com"],
+            ["b@example.com"],
+            ["c@example.com"],
+        ]
+        for recipient in ("a@example.com", "b@example.com", "c@example.com"):
+            message = outbox(recipient)
+            assert message.status == mail.SENT
+            assert message.sent_at is not None
+            assert message.body is None
+        assert mail.deliver_outbox() == (0, 0)
+
+
+def test_transient_rejection_is_retried_with_backoff(app, smtp_server):
+    with app.app_context():
+        enqueue("busy@example.com", "ok@example.com")
+
+        assert mail.deliver_outbox() == (2, 1)
+
+        message = outbox("busy@example.com")
+        assert message.status == mail.PENDING
+        assert message.attempts == 1
+        assert "450" in message.last_error
+        delay = message.next_attempt_at - datetime.utcnow()
+        assert timedelta(seconds=mail.MAIL_RETRY_DELAY * 0.9) < delay
+        assert delay <= timedelta(seconds=mail.MAIL_RETRY_DELAY * 1.1)
+        # Backing off, so the next poll leaves it alone.
+        assert mail.deliver_outbox() == (0, 0)
+
+        make_due("busy@example.com")
+        assert mail.deliver_outbox() == (1, 0)
+        assert outbox("busy@example.com").attempts == 2
+
+
+def test_transient_rejection_fails_after_max_attempts(app, smtp_server, monkeypatch):
+    monkeypatch.setattr(mail, "MAIL_MAX_ATTEMPTS", 2)
+    with app.app_context():
+        enqueue("busy@example.com")
+        mail.deliver_outbox()
+        make_due("busy@example.com")
+        mail.deliver_outbox()
+
+        message = outbox("busy@example.com")
+        assert message.status == mail.FAILED
+        assert message.attempts == 2
+        assert message.body is None
+
+
+def test_permanent_rejection_fails_at_once(app, smtp_server):
+    with app.app_context():
+        enqueue("reject@example.com", "ok@example.com")
+
+        assert mail.deliver_outbox() == (2, 1)
+
+        message = outbox("reject@example.com")
+        assert message.status == mail.FAILED
+        assert message.attempts == 1
+        assert "550" in message.last_error
+        assert message.body is None
+        assert outbox("ok@example.com").status == mail.SENT
+
+
+def test_connection_failure_hands_the_batch_back(app, smtp_server, monkeypatch):
+    # Nothing listens on port 1, so the first send fails to connect.
+    monkeypatch.setenv("SMTP_PORT", "1")
+    with app.app_context():
+        enqueue("a@example.com", "b@example.com")
+
+        assert mail.deliver_outbox() == (2, 0)
+
+        first, second = outbox("a@example.com"), outbox("b@example.com")
+        assert first.status == second.status == mail.PENDING
+        assert first.attempts == 1
+        # The untried message is not charged an attempt, only delayed.
+        assert second.attempts == 0
+        assert second.next_attempt_at > datetime.utcnow()
+        assert smtp_server.messages == []
+
+
+def test_claim_leases_messages_to_one_worker(app):
+    with app.app_context():
+        enqueue("a@example.com", "b@example.com")
+
+        claimed = mail.claim_batch(10)
+        assert [message.recipient for message in claimed] == [
+            "a@example.com",
+            "b@example.com",
+        ]
+        assert {message.status for message in claimed} == {mail.SENDING}
+        # Another worker polling now finds nothing due.
+        assert mail.claim_batch(10) == []
+
+        # Once the lease runs out (the worker died), the messages are due again.
+        for message in claimed:
+            message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert len(mail.claim_batch(10)) == 2
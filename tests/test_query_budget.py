@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.datagen import ADMIN_NAME, BENCH_PASSWORD, generate
+from website.sqlstats import QueryBudgetExceeded
+
+
+# Listings must not run a query per row: a page of 500 notes costs the same
+# handful of queries as a page of 10.
+LISTING_QUERY_BUDGET = 5
+
+LISTINGS = (
+    "/",
+    "/?per_page=10",
+    "/?per_page=500",
+    "/search?search=hearing",
+    "/view-cases",
+    "/view-courts",
+    "/case-files/1",
+    "/api/calendar",
+    "/lookup/cases?q=C",
+    "/lookup/courts",
+)
+
+
+@pytest.fixture
+def seeded_app(app):
+    generate(app, users=5, courts=20, cases=100, notes=600, files=30)
+    app.config["SQL_QUERY_BUDGET"] = LISTING_QUERY_BUDGET
+    return app
+
+
+def login(app, name):
+    client = app.test_client()
+    client.post("/login", data={"name": name, "password": BENCH_PASSWORD})
+    # Render a page to consume the login flash, so listings answer as they
+    # usually do rather than skipping their ETag for a pending flash.
+    client.get("/")
+    return client
+
+
+@pytest.mark.parametrize("name", [ADMIN_NAME, "bench-user-1"])
+def test_listings_stay_within_query_budget(seeded_app, name):
+    client = login(seeded_app, name)
+    for url in LISTINGS:
+        # Over budget, the request raises QueryBudgetExceeded in testing mode.
+        response = client.get(url)
+        assert response.status_code in (200, 302), url
+        assert int(response.headers["X-Query-Count"]) <= LISTING_QUERY_BUDGET
+
+
+def test_query_count_does_not_grow_with_page_size(seeded_app):
+    client = login(seeded_app, ADMIN_NAME)
+    small = client.get("/?per_page=10").headers["X-Query-Count"]
+    large = client.get("/?per_page=500").headers["X-Query-Count"]
+    assert small == large
+
+
+def test_request_over_budget_fails_in_testing(seeded_app):
+    client = login(seeded_app, ADMIN_NAME)
+    seeded_app.config["SQL_QUERY_BUDGET"] = 0
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/view-cases")
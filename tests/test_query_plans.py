@@ -0,0 +1,12 @@
+from website import db
+from website.queryplans import check_query_plans
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        failures = {
+            name: details
+            for name, details, problems in check_query_plans(db.engine)
+            if problems
+        }
+    assert not failures, failures
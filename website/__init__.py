@@ -13,18 +13,20 @@ basedir = path.abspath(path.dirname(__file__))
 env_path = path.join(basedir, "..", ".env")
 
 
-if not os.path.exists(env_path):
-    print(
-        "Error: `.env` file not found. Please create it based on `.env.example` and fill in the variables."
-    )
-    sys.exit(1)
+if os.path.exists(env_path):
+    load_dotenv(env_path)
 
 
-load_dotenv(env_path)
+db = SQLAlchemy()
+DB_NAME = "database.db"
 
 
-secret = os.getenv("SECRET_KEY")
-if not secret:
+def exit_without_secret_key():
+    if not os.path.exists(env_path):
+        print(
+            "Error: `.env` file not found. Please create it based on `.env.example` and fill in the variables."
+        )
+        sys.exit(1)
 
     import secrets
 
@@ -37,17 +39,53 @@ if not secret:
     sys.exit(1)
 
 
-db = SQLAlchemy()
-DB_NAME = "database.db"
+def create_app(config=None, instance_path=None):
+    """
+    Build the app from `.env` and the environment. `config` overrides Flask
+    settings such as SECRET_KEY, SQLALCHEMY_DATABASE_URI, UPLOAD_FOLDER and
+    TESTING, and `instance_path` moves the instance folder, so the app can
+    run against a throwaway database and upload directory without a `.env`.
+    """
+    app = Flask(__name__, instance_path=instance_path)
+
+    from .routes import UPLOAD_FOLDER
+
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY")
+    app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+    app.config.update(config or {})
+    if not app.config["SECRET_KEY"]:
+        exit_without_secret_key()
+
+    # Behind nginx every client is 127.0.0.1 unless X-Forwarded-For is
+    # trusted; login throttling keys on the real client address.
+    trusted_proxies = int(os.getenv("TRUSTED_PROXY_COUNT", 0))
+    if trusted_proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies
+        )
+
+    query_budget = os.getenv("SQL_QUERY_BUDGET")
+    app.config.setdefault(
+        "SQL_QUERY_BUDGET", int(query_budget) if query_budget else None
+    )
+
+    from .database import init_database
 
+    init_database(app, db, DB_NAME)
 
-def create_app():
-    app = Flask(__name__)
+    from .sqlstats import init_query_counter
 
-    app.config["SECRET_KEY"] = secret
+    init_query_counter(app)
 
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_NAME}"
-    db.init_app(app)
+    from .metrics import init_metrics
+
+    init_metrics(app)
+
+    from .profiler import init_profiler
+
+    init_profiler(app)
 
     from .routes import routes
     from .auth import auth
@@ -59,16 +97,58 @@ def create_app():
 
     from .models import User
 
-    with app.app_context():
-        db.create_all()
+    from .migrations import init_migrations
+
+    init_migrations(app, db)
+
+    from .versions import init_versions
+
+    init_versions(app)
+
+    from .rendercache import init_render_cache
+
+    init_render_cache(app)
+
+    from .auth import init_auth
+
+    init_auth(app)
+
+    from .fulltext import init_fulltext
+
+    init_fulltext(app, db)
+
+    from .notesync import init_notesync
+
+    init_notesync(app)
+
+    from .storage import init_storage
+
+    init_storage(app, app.config["UPLOAD_FOLDER"])
+
+    from .uploads import init_uploads
+
+    init_uploads(app, app.config["UPLOAD_FOLDER"])
+
+    from .blobs import init_blobs
+
+    init_blobs(app, app.config["UPLOAD_FOLDER"])
+
+    from .mail import init_mail
+
+    init_mail(app)
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(id):
-        return User.query.get(int(id))
+    from .identity import init_identity
+
+    init_identity(app, login_manager)
+
+    from .background import BACKGROUND_JOBS, start_background_jobs
+
+    if BACKGROUND_JOBS == "startup":
+        start_background_jobs(app)
 
     return app
 
@@ -1,86 +1,140 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    flash,
+    redirect,
+    url_for,
+    jsonify,
+    current_app,
+    abort,
+    send_file,
+)
 from flask_login import login_required, current_user
-from .models import User
+from .models import User, OutboxEmail
 from . import db
 from werkzeug.security import generate_password_hash
-from .utils import (
-    has_sql_injection,
-    is_valid_range,
-    generate_random_password,
-    is_valid_email,
-    admin_required,
-)
+from .utils import generate_random_password, admin_required
+from .validation import USER_SCHEMA
+from .mail import enqueue_email, notify_outbox, latest_emails
+from .identity import invalidate_identities
+from .versions import versioned_listing
+from .profiler import PROFILER, PROFILE_ENDPOINTS, PROFILE_SAMPLE_RATE
+from .importer import IMPORTERS, import_rows, read_upload
+from .auth import SET_PASSWORD_MAX_AGE, set_password_token
 import json
 
-
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
-
 admin = Blueprint("admin", __name__)
 
 
-def send_credentials_email(email, username, password):
-    try:
-
-        smtp_server = os.getenv("SMTP_SERVER", "smtp.example.com")
-        smtp_port = int(os.getenv("SMTP_PORT", 465))
-        smtp_username = os.getenv("SMTP_USERNAME")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        sender_email = os.getenv("SENDER_EMAIL", "noreply@example.com")
-
-        if not smtp_username or not smtp_password:
-            return False, "SMTP credentials not configured"
-
-        print(f"SMTP Settings: {smtp_server}:{smtp_port}, User: {smtp_username}")
-
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = email
-        message["Subject"] = "Your new account credentials"
-
-        body = f"""
+def queue_credentials_email(user):
+    # The outbox keeps the body until delivery, so it carries a link that
+    # expires and works once rather than the password itself.
+    link = url_for("auth.set_password", token=set_password_token(user), _external=True)
+    hours = SET_PASSWORD_MAX_AGE // 3600
+    expiry = f"{hours // 24} days" if hours >= 48 else f"{max(hours, 1)} hours"
+    body = f"""
         <html>
         <body>
             <h2>Welcome to Case Management System</h2>
-            <p>Your account has been created. Here are your credentials:</p>
-            <p><strong>Username:</strong> {username}</p>
-            <p><strong>Password:</strong> {password}</p>
-            <p>Please login and change your password immediately.</p>
+            <p>Your account has been created.</p>
+            <p><strong>Username:</strong> {user.name}</p>
+            <p><a href="{link}">Choose your password</a> to sign in.
+            The link works once and expires in {expiry}.</p>
             <p>This is an automated message, please do not reply.</p>
         </body>
         </html>
         """
+    return enqueue_email(
+        user.email, "Your new account credentials", body, user_id=user.id
+    )
 
-        message.attach(MIMEText(body, "html"))
 
-        print(f"Connecting to SMTP server {smtp_server}:{smtp_port} via SSL...")
-        server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        server.set_debuglevel(1)
+@admin.route("/view-users", methods=["GET"])
+@login_required
+@admin_required
+@versioned_listing("user", "email_outbox")
+def view_users():
+    try:
+        users = User.query.all()
+        emails = latest_emails([u.id for u in users])
+        return render_template(
+            "view-users.html", user=current_user, users=users, emails=emails
+        )
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
 
-        print(f"Authenticating as {smtp_username}...")
-        server.login(smtp_username, smtp_password)
 
-        print("Sending message...")
-        server.sendmail(sender_email, email, message.as_string())
-        server.quit()
+@admin.route("/render-cache-stats", methods=["GET"])
+@login_required
+@admin_required
+def render_cache_stats():
+    """Hit/miss counters of this worker's listing render cache"""
+    return jsonify(current_app.extensions["render_cache"].stats())
 
-        print("Message sent successfully!")
 
-        return True, "Email sent successfully"
+@admin.route("/profiles", methods=["GET"])
+@login_required
+@admin_required
+def view_profiles():
+    try:
+        captures = current_app.extensions["profile_store"].captures()
+        return render_template(
+            "view-profiles.html",
+            user=current_user,
+            captures=captures,
+            enabled=PROFILER,
+            sample_rate=PROFILE_SAMPLE_RATE,
+            endpoints=sorted(PROFILE_ENDPOINTS),
+        )
     except Exception as e:
-        print(f"Error sending email: {e}")
-        return False, str(e)
+        return jsonify({"Error": str(e)}), 500
 
 
-@admin.route("/view-users", methods=["GET"])
+@admin.route("/profiles/<name>", methods=["GET"])
 @login_required
 @admin_required
-def view_users():
+def download_profile(name):
+    path = current_app.extensions["profile_store"].path(name)
+    if path is None:
+        abort(404)
+    return send_file(
+        path,
+        mimetype="application/octet-stream",
+        as_attachment=True,
+        download_name=name,
+    )
+
+
+@admin.route("/import", methods=["GET", "POST"])
+@login_required
+@admin_required
+def import_data():
+    kind = request.form.get("kind", "cases")
+    report = None
     try:
-        users = User.query.all()
-        return render_template("view-users.html", user=current_user, users=users)
+        if request.method == "POST":
+            file = request.files.get("file")
+            if kind not in IMPORTERS:
+                flash("Unknown import type.", category="error")
+            elif not file or not file.filename:
+                flash("No selected file", category="error")
+            else:
+                try:
+                    report = import_rows(kind, read_upload(file), current_user.id)
+                except ValueError as e:
+                    flash(str(e), category="error")
+                else:
+                    current_app.logger.info(
+                        "Imported %d of %d %s rows in %.2fs",
+                        report.inserted,
+                        report.rows,
+                        kind,
+                        report.seconds,
+                    )
+        return render_template(
+            "import-data.html", user=current_user, kind=kind, report=report
+        )
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
@@ -91,16 +145,11 @@ def view_users():
 def create_user():
     try:
         if request.method == "POST":
-            email = request.form.get("email")
-
-            if (
-                not email
-                or not is_valid_range(email, 150)
-                or has_sql_injection(email)
-                or not is_valid_email(email)
-            ):
+            values, errors = USER_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid email format.", category="error")
                 return render_template("create-user.html", user=current_user)
+            email = values["email"]
 
             existing_user = User.query.filter_by(email=email).first()
             if existing_user:
@@ -118,6 +167,8 @@ def create_user():
                 existing_name = User.query.filter_by(name=username).first()
                 counter += 1
 
+            # Nobody knows this password; the user chooses their own through
+            # the link in the credentials email.
             password = generate_random_password()
 
             new_user = User(
@@ -129,20 +180,15 @@ def create_user():
             )
 
             db.session.add(new_user)
+            db.session.flush()
+            queue_credentials_email(new_user)
             db.session.commit()
+            notify_outbox()
 
-            success, message = send_credentials_email(email, username, password)
-
-            if success:
-                flash(
-                    f"User created successfully! Credentials sent to {email}.",
-                    category="success",
-                )
-            else:
-                flash(
-                    f"User created but failed to send email: {message}",
-                    category="warning",
-                )
+            flash(
+                f"User created successfully! Credentials will be sent to {email}.",
+                category="success",
+            )
 
             return redirect(url_for("admin.view_users"))
 
@@ -168,6 +214,7 @@ def toggle_user_status():
 
         user.is_active = not user.is_active
         db.session.commit()
+        invalidate_identities()
 
         action = "activated" if user.is_active else "deactivated"
         return (
@@ -195,8 +242,10 @@ def delete_user():
         if user.id == current_user.id:
             return jsonify({"error": "You cannot delete your own account"}), 400
 
+        OutboxEmail.query.filter_by(user_id=user.id).delete()
         db.session.delete(user)
         db.session.commit()
+        invalidate_identities()
 
         return jsonify({"message": "User deleted successfully"}), 200
     except Exception as e:
@@ -1,38 +1,64 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import (
+    Blueprint,
+    current_app,
+    render_template,
+    request,
+    flash,
+    redirect,
+    url_for,
+)
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from .models import User
 from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 from flask_login import login_user, login_required, logout_user, current_user
 from .utils import generate_random_password, has_sql_injection
+from .validation import LOGIN_SCHEMA, SET_PASSWORD_SCHEMA
+from .identity import invalidate_identities
+from .metrics import PASSWORD_CHECK_SECONDS
+from .throttle import (
+    LoginBusy,
+    LoginThrottled,
+    check_login_allowed,
+    hash_slot,
+    record_login_failure,
+    record_login_success,
+)
+from sqlalchemy.exc import IntegrityError
+import click
+import hashlib
 import os
-from dotenv import load_dotenv
-import sys
 
-load_dotenv()
 auth = Blueprint("auth", __name__)
 
+SET_PASSWORD_MAX_AGE = int(os.getenv("SET_PASSWORD_MAX_AGE") or 7 * 24 * 3600)
+PASSWORD_MIN_LENGTH = 8
+
 
 def validate_admin_password():
+    """Return (password, warning) where warning explains a generated password"""
     env_password = os.getenv("ADMIN_PASSWORD")
     if not env_password:
         new_password = generate_random_password()
-        print("\nWARNING: No admin password found in .env file!")
-        print(f"Generated password: {new_password}")
-        print(
-            "Please add this password to your .env file as ADMIN_PASSWORD=your_password"
+        warning = (
+            "\nWARNING: No admin password found in .env file!\n"
+            f"Generated password: {new_password}\n"
+            "Please add this password to your .env file as ADMIN_PASSWORD=your_password\n"
+            "Using generated password for now...\n"
         )
-        print("Using generated password for now...\n")
-        return new_password
+        return new_password, warning
 
     if has_sql_injection(env_password):
         new_password = generate_random_password()
-        print("\nWARNING: Admin password in .env contains forbidden characters!")
-        print(f"Suggested safe password: {new_password}")
-        print("Please update your .env file with a safe password")
-        print("Using generated password for now...\n")
-        return new_password
+        warning = (
+            "\nWARNING: Admin password in .env contains forbidden characters!\n"
+            f"Suggested safe password: {new_password}\n"
+            "Please update your .env file with a safe password\n"
+            "Using generated password for now...\n"
+        )
+        return new_password, warning
 
-    return env_password
+    return env_password, None
 
 
 def is_admin_exists():
@@ -41,7 +67,11 @@ def is_admin_exists():
 
 
 def create_admin():
-    admin_password = validate_admin_password()
+    """
+    Create the admin account. Returns False if another worker booting at
+    the same time got there first.
+    """
+    admin_password, warning = validate_admin_password()
     new_admin_user = User(
         name="admin",
         password=generate_password_hash(admin_password, method="scrypt"),
@@ -49,30 +79,51 @@ def create_admin():
         is_admin=True,
     )
     db.session.add(new_admin_user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    if warning:
+        print(warning)
     print(f"\nAdmin user created successfully!")
+    return True
+
+
+def ensure_admin():
+    if is_admin_exists():
+        return False
+    return create_admin()
+
+
+def client_ip():
+    return request.remote_addr or "unknown"
 
 
 @auth.route("/login", methods=["GET", "POST"])
 def login():
-    if not is_admin_exists():
-        create_admin()
-
     if request.method == "POST":
-        name = request.form.get("name")
-        password = request.form.get("password")
+        values, errors = LOGIN_SCHEMA.validate(request.form)
         remember = request.form.get("remember-me")
         remember_value = True if remember == "on" else False
 
-        if (
-            not name
-            or not password
-            or has_sql_injection(name)
-            or has_sql_injection(password)
-        ):
+        if errors:
             flash("Invalid form.", category="error")
             return redirect(url_for("auth.login"))
 
+        name = values["name"]
+        ip = client_ip()
+        try:
+            check_login_allowed(ip, name)
+        except LoginThrottled as e:
+            minutes = -(-e.retry_after // 60)
+            flash(
+                f"Too many failed login attempts. Try again in {minutes} min.",
+                category="error",
+            )
+            response = render_template("login.html", user=current_user)
+            return response, 429, {"Retry-After": str(e.retry_after)}
+
         user = User.query.filter_by(name=name).first()
         if user:
             if not user.is_active:
@@ -80,20 +131,108 @@ def login():
                     "This account has been deactivated. Contact administrator.",
                     category="error",
                 )
-            elif check_password_hash(user.password, password):
-                flash("Logged in successfully!", category="success")
-                login_user(user, remember=remember_value)
-                return redirect(url_for("routes.home"))
             else:
+                try:
+                    with hash_slot(), PASSWORD_CHECK_SECONDS.time():
+                        valid = check_password_hash(user.password, values["password"])
+                except LoginBusy:
+                    flash("Server is busy, please try again.", category="error")
+                    response = render_template("login.html", user=current_user)
+                    return response, 503, {"Retry-After": "1"}
+
+                if valid:
+                    record_login_success(name)
+                    flash("Logged in successfully!", category="success")
+                    login_user(user, remember=remember_value)
+                    return redirect(url_for("routes.home"))
+                record_login_failure(ip, name)
                 flash("Incorrect password, try again.", category="error")
         else:
+            record_login_failure(ip, name)
             flash("Name does not exist.", category="error")
 
     return render_template("login.html", user=current_user)
 
 
+def _password_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt="set-password")
+
+
+def _password_fingerprint(user):
+    # Changes with the password hash, so a link stops working once used.
+    return hashlib.sha256(user.password.encode()).hexdigest()[:16]
+
+
+def set_password_token(user):
+    """A signed link token that lets `user` choose a password once"""
+    return _password_serializer().dumps([user.id, _password_fingerprint(user)])
+
+
+def user_for_password_token(token):
+    """The active user a set-password token belongs to, or None"""
+    try:
+        user_id, fingerprint = _password_serializer().loads(
+            token, max_age=SET_PASSWORD_MAX_AGE
+        )
+    except (BadSignature, TypeError, ValueError):
+        return None
+    user = db.session.get(User, user_id)
+    if user is None or not user.is_active:
+        return None
+    if _password_fingerprint(user) != fingerprint:
+        return None
+    return user
+
+
+@auth.route("/set-password/<token>", methods=["GET", "POST"])
+def set_password(token):
+    user = user_for_password_token(token)
+    if user is None:
+        flash("This link is invalid or has expired.", category="error")
+        return redirect(url_for("auth.login"))
+
+    if request.method == "POST":
+        values, errors = SET_PASSWORD_SCHEMA.validate(request.form)
+        if errors:
+            flash("Invalid form.", category="error")
+        elif len(values["password"]) < PASSWORD_MIN_LENGTH:
+            flash(
+                f"Password must be at least {PASSWORD_MIN_LENGTH} characters.",
+                category="error",
+            )
+        elif values["password"] != values["confirm"]:
+            flash("Passwords do not match.", category="error")
+        else:
+            user.password = generate_password_hash(values["password"], method="scrypt")
+            db.session.commit()
+            invalidate_identities()
+            flash("Password set, please sign in.", category="success")
+            return redirect(url_for("auth.login"))
+
+    return render_template(
+        "set-password.html",
+        user=current_user,
+        name=user.name,
+        min_length=PASSWORD_MIN_LENGTH,
+    )
+
+
 @auth.route("/logout")
 @login_required
 def logout():
     logout_user()
     return redirect(url_for("auth.login"))
+
+
+def init_auth(app):
+    with app.app_context():
+        ensure_admin()
+        db.session.remove()
+
+    @app.cli.command("create-admin")
+    def create_admin_command():
+        """Create the admin account from ADMIN_PASSWORD if it does not exist."""
+        if ensure_admin():
+            click.echo("Admin user created.")
+        else:
+            click.echo("Admin user already exists.")
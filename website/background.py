@@ -0,0 +1,22 @@
+import os
+import threading
+
+
+# "startup" starts background jobs from create_app. gunicorn.conf.py sets
+# "post_fork" so the preloading master never runs them: threads do not
+# survive fork, and each worker starts its own after it boots.
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "startup")
+
+
+def register_job(app, name, target, *args):
+    """Declare a daemon thread to run target(*args) in every serving process"""
+    app.extensions.setdefault("background_jobs", []).append((name, target, args))
+
+
+def start_background_jobs(app):
+    """Start the registered jobs once per process; a no-op in testing mode"""
+    if app.testing or app.extensions.get("background_jobs_pid") == os.getpid():
+        return
+    app.extensions["background_jobs_pid"] = os.getpid()
+    for name, target, args in app.extensions.get("background_jobs", []):
+        threading.Thread(target=target, args=args, name=name, daemon=True).start()
@@ -0,0 +1,278 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import uuid
+
+import click
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Blob, CaseFile
+from .storage import adjust_physical_usage, reconcile_storage_usage
+
+
+BLOB_DIR_NAME = "blobs"
+LOCK_DIR_NAME = ".locks"
+HASH_BUFFER_SIZE = 64 * 1024
+
+blobs = Blob.__table__
+
+
+def blob_path(sha256):
+    """Path of a blob relative to the upload folder, fanned out by hash prefix"""
+    return os.path.join(BLOB_DIR_NAME, sha256[:2], sha256[2:4], sha256)
+
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as source:
+        while True:
+            block = source.read(HASH_BUFFER_SIZE)
+            if not block:
+                break
+            sha256.update(block)
+            size += len(block)
+    return sha256.hexdigest(), size
+
+
+def save_to_temp(upload_folder, file):
+    """Copy an uploaded file to a temp path, hashing it on the way"""
+    temp_dir = os.path.join(upload_folder, ".partial")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(temp_path, "wb") as target:
+        while True:
+            block = file.read(HASH_BUFFER_SIZE)
+            if not block:
+                break
+            target.write(block)
+            sha256.update(block)
+            size += len(block)
+    return temp_path, sha256.hexdigest(), size
+
+
+def _blob_state(session):
+    """Blob locks and file changes of the session's current transaction"""
+    return session.info.setdefault(
+        "blob_files", {"locks": {}, "placed": [], "released": []}
+    )
+
+
+def _lock_blob(session, upload_folder, sha256):
+    """
+    Lock the blob's stripe until the transaction ends, so placing or
+    unlinking its file follows the committed reference count. Callers lock
+    after writing the blob row: the database serializes the writers first,
+    so whoever holds a stripe never waits on the database for another one.
+    """
+    locks = _blob_state(session)["locks"]
+    stripe = sha256[:2]
+    if stripe not in locks:
+        path = os.path.join(upload_folder, BLOB_DIR_NAME, LOCK_DIR_NAME, stripe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock = open(path, "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        locks[stripe] = lock
+
+
+def _remove_blob_file(upload_folder, sha256):
+    """Unlink a blob and prune its fan-out directories once they are empty"""
+    path = os.path.join(upload_folder, blob_path(sha256))
+    if os.path.exists(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    for _ in range(2):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def _place_file(source_path, target_path):
+    for attempt in range(2):
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        try:
+            os.replace(source_path, target_path)
+            return
+        except FileNotFoundError:
+            # A fan-out directory was pruned under us; recreate it once.
+            if attempt or not os.path.exists(source_path):
+                raise
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    _blob_state(session)["committed"] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _finish_blob_files(session, transaction):
+    """
+    After a commit, unlink the blobs whose last reference went away; after
+    a rollback, unlink files placed for blobs whose rows were never
+    committed. Either way the locks are released afterwards.
+    """
+    if transaction.parent is not None or "blob_files" not in session.info:
+        return
+    state = session.info.pop("blob_files")
+    try:
+        if state.get("committed"):
+            for upload_folder, sha256 in state["released"]:
+                _remove_blob_file(upload_folder, sha256)
+        else:
+            for upload_folder, sha256 in state["placed"]:
+                _remove_blob_file(upload_folder, sha256)
+    finally:
+        for lock in state["locks"].values():
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+
+def add_blob_reference(upload_folder, source_path, sha256, size):
+    """
+    Take one reference on the blob for `sha256`, storing `source_path` as
+    its content if the blob is new, and return the blob path relative to
+    the upload folder. `source_path` is consumed either way. Runs in the
+    current session transaction; the caller commits. If the transaction
+    rolls back, a file placed for a new blob is removed again.
+    """
+    relative_path = blob_path(sha256)
+    target_path = os.path.join(upload_folder, relative_path)
+    session = db.session()
+    connection = session.connection()
+
+    updated = connection.execute(
+        blobs.update()
+        .where(blobs.c.sha256 == sha256)
+        .values(ref_count=blobs.c.ref_count + 1)
+    ).rowcount
+    if not updated:
+        connection.execute(blobs.insert().values(sha256=sha256, size=size, ref_count=1))
+        adjust_physical_usage(connection, size)
+    _lock_blob(session, upload_folder, sha256)
+    if not updated:
+        _blob_state(session)["placed"].append((upload_folder, sha256))
+
+    if os.path.exists(target_path):
+        os.remove(source_path)
+    else:
+        _place_file(source_path, target_path)
+    return relative_path
+
+
+def release_blob_reference(upload_folder, sha256):
+    """
+    Drop one reference. When it was the last one the blob row is deleted
+    and its file is unlinked once the transaction commits. Returns whether
+    it was the last reference.
+    """
+    session = db.session()
+    connection = session.connection()
+    connection.execute(
+        blobs.update()
+        .where(blobs.c.sha256 == sha256)
+        .values(ref_count=blobs.c.ref_count - 1)
+    )
+    _lock_blob(session, upload_folder, sha256)
+    row = connection.execute(
+        select(blobs.c.size).where(blobs.c.sha256 == sha256, blobs.c.ref_count <= 0)
+    ).first()
+    if row is None:
+        return False
+    connection.execute(blobs.delete().where(blobs.c.sha256 == sha256))
+    adjust_physical_usage(connection, -row.size)
+    _blob_state(session)["released"].append((upload_folder, sha256))
+    return True
+
+
+def blob_exists(sha256):
+    return (
+        db.session.execute(
+            select(blobs.c.sha256).where(blobs.c.sha256 == sha256)
+        ).first()
+        is not None
+    )
+
+
+def _link_to_temp(upload_folder, path):
+    """A temp hard link (or copy) of `path` that add_blob_reference may consume"""
+    temp_dir = os.path.join(upload_folder, ".partial")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}.part")
+    try:
+        os.link(path, temp_path)
+    except OSError:
+        shutil.copyfile(path, temp_path)
+    return temp_path
+
+
+def dedupe_legacy_files(upload_folder, batch_size=100):
+    """
+    Move files uploaded before content addressing into the blob store.
+
+    Each legacy CaseFile is hashed, a link to its file becomes (or is merged
+    into) the blob for that hash and the row is repointed. The legacy paths
+    are only unlinked once their batch has committed, so an error part way
+    through leaves every row pointing at a file that still exists. Returns
+    (files, bytes freed).
+    """
+    migrated = freed = 0
+    last_id = 0
+    while True:
+        legacy_files = (
+            CaseFile.query.filter(CaseFile.sha256.is_(None), CaseFile.id > last_id)
+            .order_by(CaseFile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not legacy_files:
+            break
+        last_id = legacy_files[-1].id
+        moved = []
+        batch_freed = 0
+        try:
+            for case_file in legacy_files:
+                path = os.path.join(upload_folder, case_file.filename)
+                if not os.path.exists(path):
+                    print(
+                        f"Skipping case_files.id={case_file.id}, missing file: {path}"
+                    )
+                    continue
+                sha256, size = hash_file(path)
+                already_stored = blob_exists(sha256)
+                # Legacy rows count towards physical usage themselves; once the
+                # row points at a blob, the blob carries those bytes instead.
+                adjust_physical_usage(db.session.connection(), -case_file.file_size)
+                case_file.filename = add_blob_reference(
+                    upload_folder, _link_to_temp(upload_folder, path), sha256, size
+                )
+                case_file.sha256 = sha256
+                case_file.file_size = size
+                moved.append(path)
+                if already_stored:
+                    batch_freed += size
+            db.session.commit()
+        except BaseException:
+            db.session.rollback()
+            raise
+        for path in moved:
+            if os.path.exists(path):
+                os.remove(path)
+        migrated += len(moved)
+        freed += batch_freed
+    return migrated, freed
+
+
+def init_blobs(app, upload_folder):
+    @app.cli.command("dedupe-uploads")
+    def dedupe_uploads():
+        """Hash legacy uploads and merge duplicates into the blob store."""
+        migrated, freed = dedupe_legacy_files(upload_folder)
+        reconcile_storage_usage()
+        click.echo(f"Migrated {migrated} files, freed {freed} bytes.")
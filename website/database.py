@@ -0,0 +1,70 @@
+import os
+
+from sqlalchemy import event
+
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE") or "WAL"
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS") or "NORMAL"
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT") or 5000)
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE") or 256 * 1024 * 1024)
+# Negative values are KiB, positive values are pages (SQLite convention).
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE") or -64 * 1024)
+
+# Pool settings are only passed to SQLAlchemy when set, so each dialect
+# keeps its own defaults otherwise.
+POOL_OPTIONS = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda value: value == "1"),
+}
+
+
+def database_uri(default_name):
+    """DATABASE_URL from the environment, else a SQLite file in the instance folder"""
+    # .env.example ships DATABASE_URL blank, which dotenv loads as "".
+    return os.getenv("DATABASE_URL") or f"sqlite:///{default_name}"
+
+
+def engine_options():
+    options = {}
+    for option, (variable, parse) in POOL_OPTIONS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = parse(value)
+    return options
+
+
+def sqlite_pragmas():
+    return (
+        ("journal_mode", SQLITE_JOURNAL_MODE),
+        ("synchronous", SQLITE_SYNCHRONOUS),
+        ("busy_timeout", SQLITE_BUSY_TIMEOUT),
+        ("mmap_size", SQLITE_MMAP_SIZE),
+        ("cache_size", SQLITE_CACHE_SIZE),
+    )
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run while one worker writes; busy_timeout makes a
+    writer wait for the lock instead of failing with "database is locked";
+    synchronous=NORMAL is durable under WAL and skips an fsync per commit.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def init_database(app, db, default_name):
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", database_uri(default_name))
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options())
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _apply_sqlite_pragmas)
@@ -0,0 +1,68 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Response, send_file
+
+from .metrics import DOWNLOAD_BYTES
+
+
+# "direct" streams files from Flask (dev, tests); "x-accel" hands the
+# transfer to nginx through the internal location in nginx.conf.
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "direct")
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/protected-uploads/")
+
+
+def content_disposition(filename):
+    """Attachment header value that survives non-ASCII file names"""
+    try:
+        filename.encode("ascii")
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        fallback = filename.encode("ascii", "ignore").decode() or "download"
+        return (
+            f'attachment; filename="{fallback}"; '
+            f"filename*=UTF-8''{quote(filename, safe='')}"
+        )
+
+
+def serve_case_file(upload_folder, case_file):
+    """
+    Build the download response for a CaseFile, or None if its file is
+    missing. Blob-backed files use their SHA-256 as a strong ETag.
+    """
+    file_path = os.path.join(upload_folder, case_file.filename)
+    if not os.path.exists(file_path):
+        return None
+
+    mimetype = (
+        mimetypes.guess_type(case_file.original_filename)[0]
+        or "application/octet-stream"
+    )
+
+    if DOWNLOAD_MODE == "x-accel":
+        # nginx serves the file itself, including Range, ETag and
+        # Last-Modified, so the worker is free as soon as headers are sent.
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX + quote(
+            case_file.filename.replace(os.sep, "/")
+        )
+        response.headers["Content-Disposition"] = content_disposition(
+            case_file.original_filename
+        )
+        DOWNLOAD_BYTES.labels(DOWNLOAD_MODE).inc(case_file.file_size or 0)
+        return response
+
+    response = send_file(
+        file_path,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=case_file.original_filename,
+        conditional=True,
+        etag=case_file.sha256 or True,
+        last_modified=os.path.getmtime(file_path),
+    )
+    response.headers["Cache-Control"] = "private, no-cache"
+    # Counts the range actually sent; nothing for a 304.
+    DOWNLOAD_BYTES.labels(DOWNLOAD_MODE).inc(response.content_length or 0)
+    return response
@@ -0,0 +1,145 @@
+import re
+
+import click
+from sqlalchemy import Float, func, literal_column, select, table, column, text
+from sqlalchemy.exc import OperationalError
+
+
+NOTE_FTS_TABLE = "notes_fts"
+
+NOTE_FTS_COLUMNS = (
+    "client_name",
+    "case_title",
+    "court_address",
+    "court_name",
+    "details",
+    "date",
+    "time",
+    "status",
+)
+
+
+def _columns(prefix=""):
+    return ", ".join(f"{prefix}{name}" for name in NOTE_FTS_COLUMNS)
+
+
+# External-content FTS5 index over `notes`, kept in sync by triggers so that
+# ORM writes, bulk UPDATE statements and raw SQL all reach the index.
+NOTE_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE {NOTE_FTS_TABLE} USING fts5(
+        {_columns()},
+        content='notes',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO {NOTE_FTS_TABLE}(rowid, {_columns()})
+        VALUES (new.id, {_columns("new.")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO {NOTE_FTS_TABLE}({NOTE_FTS_TABLE}, rowid, {_columns()})
+        VALUES ('delete', old.id, {_columns("old.")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE ON notes BEGIN
+        INSERT INTO {NOTE_FTS_TABLE}({NOTE_FTS_TABLE}, rowid, {_columns()})
+        VALUES ('delete', old.id, {_columns("old.")});
+        INSERT INTO {NOTE_FTS_TABLE}(rowid, {_columns()})
+        VALUES (new.id, {_columns("new.")});
+    END
+    """,
+]
+
+
+notes_fts = table(NOTE_FTS_TABLE, column("rowid"))
+
+
+def _fts_table_exists(connection):
+    return (
+        connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": NOTE_FTS_TABLE},
+        ).first()
+        is not None
+    )
+
+
+def setup_note_fts(engine):
+    """
+    Create the notes full-text index and its triggers if they are missing.
+
+    Returns False when the database is not SQLite or SQLite was built
+    without FTS5, in which case search falls back to LIKE matching.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        with engine.begin() as connection:
+            if _fts_table_exists(connection):
+                for statement in NOTE_FTS_DDL[1:]:
+                    connection.execute(text(statement))
+            else:
+                for statement in NOTE_FTS_DDL:
+                    connection.execute(text(statement))
+                rebuild_note_fts(connection)
+        return True
+    except OperationalError as e:
+        print(f"Full-text search disabled: {e}")
+        return False
+
+
+def rebuild_note_fts(connection):
+    """Re-index every row of `notes` from scratch"""
+    connection.execute(
+        text(f"INSERT INTO {NOTE_FTS_TABLE}({NOTE_FTS_TABLE}) VALUES ('rebuild')")
+    )
+
+
+def build_match_query(search_query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every whitespace separated term becomes a prefix phrase of its word
+    tokens, so `2024-05` matches dates starting with those parts and
+    `ivan pet` matches "Ivan Petrov". Returns None if nothing is searchable.
+    """
+    phrases = []
+    for term in (search_query or "").split():
+        tokens = re.findall(r"\w+", term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+    return " ".join(phrases) or None
+
+
+def note_match_subquery(match_query):
+    """Select (id, rank) of notes matching `match_query`, best matches first"""
+    return (
+        select(
+            literal_column("rowid").label("id"),
+            func.bm25(literal_column(NOTE_FTS_TABLE), type_=Float).label("rank"),
+        )
+        .select_from(notes_fts)
+        .where(literal_column(NOTE_FTS_TABLE).op("MATCH")(match_query))
+        .subquery()
+    )
+
+
+def init_fulltext(app, db):
+    with app.app_context():
+        app.extensions["note_fts"] = setup_note_fts(db.engine)
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index():
+        """Rebuild the notes full-text search index."""
+        if not app.extensions.get("note_fts"):
+            click.echo("Full-text search is not available on this database.")
+            return
+        with db.engine.begin() as connection:
+            rebuild_note_fts(connection)
+        click.echo("Search index rebuilt.")
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+from flask_login import UserMixin
+
+from . import db
+from .models import User
+
+
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 60))
+
+VERSION_FILE_NAME = "identity.version"
+
+
+class Identity(UserMixin):
+    """Detached copy of the fields requests need from the logged-in User"""
+
+    def __init__(self, id, name, is_admin, is_active):
+        self.id = id
+        self.name = name
+        self.is_admin = is_admin
+        self._is_active = is_active
+
+    @property
+    def is_active(self):
+        return self._is_active
+
+
+class IdentityCache:
+    """
+    Per-process TTL cache of login identities.
+
+    Every worker compares a shared version stamp, a small file next to the
+    database, on each lookup and drops its whole cache when the stamp has
+    changed. Writers call bump() after committing a change to a user, so a
+    deactivation or deletion is seen by all workers on their next request.
+    The stamp is read with one small file read, which is much cheaper than
+    a query.
+    """
+
+    def __init__(self, version_path, ttl=IDENTITY_CACHE_TTL):
+        self.version_path = version_path
+        self.ttl = ttl
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _read_version(self):
+        try:
+            with open(self.version_path) as stamp:
+                return stamp.read()
+        except FileNotFoundError:
+            return ""
+
+    def bump(self):
+        temp_path = f"{self.version_path}.{uuid.uuid4().hex}"
+        with open(temp_path, "w") as stamp:
+            stamp.write(uuid.uuid4().hex)
+        os.replace(temp_path, self.version_path)
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, user_id):
+        version = self._read_version()
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+
+        row = db.session.execute(
+            db.select(User.id, User.name, User.is_admin, User.is_active).where(
+                User.id == user_id
+            )
+        ).first()
+        identity = Identity(*row) if row else None
+        with self._lock:
+            if self._version == version:
+                self._entries[user_id] = (now + self.ttl, identity)
+        return identity
+
+
+def invalidate_identities():
+    """Call after committing a change to any user's login fields"""
+    current_app.extensions["identity_cache"].bump()
+
+
+def init_identity(app, login_manager):
+    os.makedirs(app.instance_path, exist_ok=True)
+    cache = IdentityCache(os.path.join(app.instance_path, VERSION_FILE_NAME))
+    app.extensions["identity_cache"] = cache
+
+    @login_manager.user_loader
+    def load_user(id):
+        identity = cache.get(int(id))
+        # Deactivated accounts are logged out on their next request.
+        if identity is None or not identity.is_active:
+            return None
+        return identity
@@ -0,0 +1,369 @@
+import codecs
+import csv
+import os
+import re
+import time
+import zipfile
+from datetime import datetime, timedelta
+from xml.etree.ElementTree import iterparse
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .export import _FORMULA_PREFIX
+from .models import Case, Court, Note
+from .validation import CASE_SCHEMA, COURT_SCHEMA, NOTE_SCHEMA
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE") or 1000)
+
+# Only the first errors are kept for the report; all of them are counted.
+MAX_REPORTED_ERRORS = 200
+
+IMPORT_FORMATS = ("csv", "xlsx")
+
+_SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL_COLUMN = re.compile(r"^([A-Z]+)")
+_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+# Day zero of Excel's serial dates (with its 1900 leap year bug folded in).
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+# Serial of 9999-12-31, Excel's last date. Larger numbers such as a CSV
+# "20240105" are not serials and are left for the date validator.
+_EXCEL_MAX_SERIAL = 2958465
+
+
+def _header_key(header):
+    """ "Client Name" -> "client_name", so exported files import as-is"""
+    return re.sub(r"[^a-z0-9]+", "_", header.strip().lower()).strip("_")
+
+
+def _unguard(value):
+    """Undo the quote stream_csv puts in front of formula-like cells"""
+    if value.startswith("'") and _FORMULA_PREFIX.match(value[1:]):
+        return value[1:]
+    return value
+
+
+def read_csv(stream):
+    """Yield rows of a UTF-8 CSV upload as lists of strings"""
+    # A codecs reader only needs read(), which every upload stream has.
+    for row in csv.reader(codecs.getreader("utf-8-sig")(stream)):
+        yield [_unguard(value) for value in row]
+
+
+def _column_index(reference):
+    index = 0
+    for letter in _CELL_COLUMN.match(reference).group(1):
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _shared_strings(archive):
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as part:
+        for _, element in iterparse(part):
+            if element.tag == f"{_SHEET_NS}si":
+                strings.append("".join(element.itertext()))
+                element.clear()
+    return strings
+
+
+def _first_sheet(archive):
+    sheets = sorted(
+        name
+        for name in archive.namelist()
+        if name.startswith("xl/worksheets/") and name.endswith(".xml")
+    )
+    if "xl/worksheets/sheet1.xml" in sheets:
+        return "xl/worksheets/sheet1.xml"
+    if not sheets:
+        raise ValueError("The workbook has no worksheets")
+    return sheets[0]
+
+
+def read_xlsx(stream):
+    """
+    Yield rows of the first worksheet of an .xlsx upload as lists of
+    strings. The sheet is parsed incrementally and every row is freed once
+    read, so memory does not grow with the number of rows.
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid .xlsx file")
+    with archive:
+        strings = _shared_strings(archive)
+        with archive.open(_first_sheet(archive)) as sheet:
+            for _, element in iterparse(sheet):
+                if element.tag != f"{_SHEET_NS}row":
+                    continue
+                row = []
+                for cell in element.iter(f"{_SHEET_NS}c"):
+                    kind = cell.get("t")
+                    if kind == "inlineStr":
+                        value = "".join(cell.itertext())
+                    else:
+                        value = cell.findtext(f"{_SHEET_NS}v") or ""
+                        if kind == "s" and value:
+                            value = strings[int(value)]
+                    reference = cell.get("r")
+                    if reference:
+                        row.extend([""] * (_column_index(reference) - len(row)))
+                    row.append(value)
+                element.clear()
+                yield row
+
+
+def _excel_date(value):
+    """Spreadsheet dates often arrive as serial day numbers"""
+    if value and _NUMBER.match(value) and 1 <= float(value) <= _EXCEL_MAX_SERIAL:
+        try:
+            moment = _EXCEL_EPOCH + timedelta(days=float(value))
+        except (OverflowError, ValueError):
+            return value
+        return moment.strftime("%Y-%m-%d")
+    return value
+
+
+def _excel_time(value):
+    if value and _NUMBER.match(value) and float(value) < 1:
+        try:
+            moment = _EXCEL_EPOCH + timedelta(days=float(value), microseconds=500)
+        except (OverflowError, ValueError):
+            return value
+        return moment.strftime("%H:%M")
+    return value
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else None
+
+
+def _describe(errors):
+    return "; ".join(f"{field}: {reason}" for field, reason in errors.items())
+
+
+class CaseImporter:
+    """Cases are duplicates when (full_name, phone) exists; phones are unique"""
+
+    model = Case
+    aliases = {"client_name": "full_name"}
+
+    def __init__(self, creator_id):
+        self.creator_id = creator_id
+        existing = db.session.execute(select(Case.full_name, Case.phone)).all()
+        self.keys = {tuple(row) for row in existing}
+        self.phones = {row.phone for row in existing}
+
+    def prepare(self, row):
+        """Return (values to insert, error message); both None for a duplicate"""
+        values, errors = CASE_SCHEMA.validate(row)
+        if errors:
+            return None, _describe(errors)
+        key = (values["full_name"], values["phone"])
+        if key in self.keys:
+            return None, None
+        if values["phone"] in self.phones:
+            return None, "phone: used by another case"
+        self.keys.add(key)
+        self.phones.add(values["phone"])
+        return dict(values, creator_id=self.creator_id), None
+
+
+class CourtImporter:
+    model = Court
+    aliases = {"court_name": "title", "court_address": "address"}
+
+    def __init__(self, creator_id):
+        self.titles = set(db.session.execute(select(Court.title)).scalars())
+
+    def prepare(self, row):
+        values, errors = COURT_SCHEMA.validate(row)
+        if errors:
+            return None, _describe(errors)
+        if values["title"] in self.titles:
+            return None, None
+        self.titles.add(values["title"])
+        return values, None
+
+
+class NoteImporter:
+    """
+    Notes name their case by case_id or phone and their court by court_id
+    or title, the id winning when both are given since court titles need
+    not be unique; the copied client, case and court fields come from the
+    preloaded rows rather than from a query per note.
+    """
+
+    model = Note
+    aliases = {"phone": "case_phone", "court_name": "court_title"}
+
+    def __init__(self, creator_id):
+        self.creator_id = creator_id
+        self.cases = {}
+        self.cases_by_phone = {}
+        for case in db.session.execute(
+            select(Case.id, Case.phone, Case.full_name, Case.title)
+        ):
+            self.cases[case.id] = case
+            self.cases_by_phone[case.phone] = case
+        self.courts = {}
+        self.courts_by_title = {}
+        for court in db.session.execute(select(Court.id, Court.title, Court.address)):
+            self.courts[court.id] = court
+            self.courts_by_title.setdefault(court.title, court)
+
+    def _resolve(self, row, name, by_id, by_key, key_column):
+        reference = (row.get(f"{name}_id") or "").strip()
+        if reference:
+            found = by_id.get(int(reference)) if reference.isdigit() else None
+            if found is None:
+                return None, f"{name}_id: not found"
+            return found, None
+        key = (row.get(key_column) or "").strip()
+        if not key:
+            return None, f"{name}_id or {key_column}: required"
+        found = by_key.get(key)
+        if found is None:
+            return None, f"{key_column}: not found"
+        return found, None
+
+    def prepare(self, row):
+        case, case_error = self._resolve(
+            row, "case", self.cases, self.cases_by_phone, "case_phone"
+        )
+        court, court_error = self._resolve(
+            row, "court", self.courts, self.courts_by_title, "court_title"
+        )
+        fields = dict(
+            row,
+            case_id=str(case.id) if case else "0",
+            court_id=str(court.id) if court else "0",
+            date=_excel_date(row.get("date")),
+            time=_excel_time(row.get("time")),
+        )
+        if fields.get("status"):
+            fields["status"] = fields["status"].lower()
+        values, errors = NOTE_SCHEMA.validate(fields)
+        problems = [error for error in (case_error, court_error) if error]
+        if errors:
+            problems.append(_describe(errors))
+        if problems:
+            return None, "; ".join(problems)
+        return (
+            dict(
+                values,
+                client_name=case.full_name,
+                case_title=case.title,
+                court_name=court.title,
+                court_address=court.address,
+                creator_id=self.creator_id,
+            ),
+            None,
+        )
+
+
+IMPORTERS = {"cases": CaseImporter, "courts": CourtImporter, "notes": NoteImporter}
+
+
+def _insert_rows(importer, report, batch):
+    """Insert row by row so the rows the database rejects can be named"""
+    for number, values in batch:
+        try:
+            db.session.execute(insert(importer.model), [values])
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            report.error(number, f"not imported: {e.orig}")
+        else:
+            report.inserted += 1
+
+
+def _insert_batch(importer, report, batch):
+    """
+    Insert one batch with a single executemany in its own transaction. If
+    the database rejects it, the batch is retried one row at a time.
+    """
+    if not batch:
+        return
+    try:
+        db.session.execute(insert(importer.model), [values for _, values in batch])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        _insert_rows(importer, report, batch)
+        return
+    report.inserted += len(batch)
+
+
+def import_rows(kind, rows, creator_id, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import `rows` (an iterable of lists, header row first) as `kind`.
+
+    Rows are validated and checked for duplicates against keys preloaded
+    once, then inserted in batches of batch_size, one transaction each, so
+    a bad batch never undoes the ones before it. Returns an ImportReport.
+    """
+    started = time.perf_counter()
+    importer = IMPORTERS[kind](creator_id)
+    report = ImportReport(kind)
+
+    rows = iter(rows)
+    headers = [_header_key(header) for header in next(rows, [])]
+    headers = [importer.aliases.get(header, header) for header in headers]
+
+    batch = []
+    # Row numbers as the spreadsheet shows them, header being row 1.
+    for number, row in enumerate(rows, start=2):
+        if not any(value.strip() for value in row):
+            continue
+        report.rows += 1
+        try:
+            values, error = importer.prepare(
+                {header: value.strip() for header, value in zip(headers, row)}
+            )
+        except (OverflowError, ValueError) as e:
+            # A value the parsers choke on fails its row, not the import.
+            values, error = None, str(e) or "invalid value"
+        if error:
+            report.error(number, error)
+        elif values is None:
+            report.duplicates += 1
+        else:
+            batch.append((number, values))
+        if len(batch) >= batch_size:
+            _insert_batch(importer, report, batch)
+            batch = []
+    _insert_batch(importer, report, batch)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def read_upload(file):
+    """Rows of an uploaded .csv or .xlsx file, chosen by its extension"""
+    extension = file.filename.rsplit(".", 1)[-1].lower() if file.filename else ""
+    if extension not in IMPORT_FORMATS:
+        raise ValueError("Upload a .csv or .xlsx file")
+    if extension == "xlsx":
+        return read_xlsx(file.stream)
+    return read_csv(file.stream)
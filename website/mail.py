@@ -0,0 +1,291 @@
+import os
+import random
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import click
+from flask import current_app
+from sqlalchemy import and_, select
+
+from . import db
+from .background import register_job
+from .metrics import SMTP_SEND_SECONDS
+from .models import OutboxEmail
+
+
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 6))
+MAIL_RETRY_DELAY = int(os.getenv("MAIL_RETRY_DELAY", 30))
+MAIL_RETRY_MAX_DELAY = int(os.getenv("MAIL_RETRY_MAX_DELAY", 3600))
+MAIL_POLL_INTERVAL = int(os.getenv("MAIL_POLL_INTERVAL", 15))
+MAIL_WORKER = os.getenv("MAIL_WORKER", "1") == "1"
+SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", 20))
+
+# A claimed message is leased to one worker for this long; if the worker
+# dies mid-batch the message becomes due again once the lease runs out.
+CLAIM_LEASE = timedelta(minutes=5)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+outbox = OutboxEmail.__table__
+
+_wakeup = threading.Event()
+
+
+def smtp_settings():
+    port = int(os.getenv("SMTP_PORT", 465))
+    return {
+        "server": os.getenv("SMTP_SERVER", "smtp.example.com"),
+        "port": port,
+        "username": os.getenv("SMTP_USERNAME"),
+        "password": os.getenv("SMTP_PASSWORD"),
+        "sender": os.getenv("SENDER_EMAIL", "noreply@example.com"),
+        "use_ssl": os.getenv("SMTP_USE_SSL", "1" if port == 465 else "0") == "1",
+        "starttls": os.getenv("SMTP_STARTTLS", "0") == "1",
+    }
+
+
+def enqueue_email(recipient, subject, html, user_id=None):
+    """
+    Add a message to the outbox in the current session. It is committed
+    together with whatever the caller is saving, then picked up by the
+    delivery worker; call notify_outbox() after the commit to wake it.
+    """
+    message = OutboxEmail(
+        recipient=recipient, subject=subject, body=html, user_id=user_id
+    )
+    db.session.add(message)
+    return message
+
+
+def notify_outbox():
+    _wakeup.set()
+
+
+def retry_delay(attempts):
+    """Exponential backoff with a little jitter so workers do not line up"""
+    delay = min(MAIL_RETRY_DELAY * 2 ** max(attempts - 1, 0), MAIL_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(1.0, 1.1))
+
+
+def latest_emails(user_ids):
+    """Most recent outbox message per user, keyed by user id"""
+    if not user_ids:
+        return {}
+    latest_ids = (
+        select(db.func.max(OutboxEmail.id))
+        .where(OutboxEmail.user_id.in_(user_ids))
+        .group_by(OutboxEmail.user_id)
+    )
+    messages = OutboxEmail.query.filter(OutboxEmail.id.in_(latest_ids)).all()
+    return {message.user_id: message for message in messages}
+
+
+def claim_batch(limit):
+    """
+    Lease up to `limit` due messages to this worker. Each claim is a
+    conditional UPDATE, so when several workers poll the same outbox a
+    message is only ever handed to one of them.
+    """
+    now = datetime.utcnow()
+    due = and_(outbox.c.status.in_((PENDING, SENDING)), outbox.c.next_attempt_at <= now)
+    candidates = (
+        db.session.execute(
+            select(outbox.c.id)
+            .where(due)
+            .order_by(outbox.c.next_attempt_at, outbox.c.id)
+            .limit(limit)
+        )
+        .scalars()
+        .all()
+    )
+    claimed = []
+    for message_id in candidates:
+        result = db.session.execute(
+            outbox.update()
+            .where(outbox.c.id == message_id, due)
+            .values(status=SENDING, next_attempt_at=now + CLAIM_LEASE)
+        )
+        if result.rowcount:
+            claimed.append(message_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return (
+        OutboxEmail.query.filter(OutboxEmail.id.in_(claimed))
+        .order_by(OutboxEmail.id)
+        .all()
+    )
+
+
+def build_message(sender, message):
+    mime = MIMEMultipart()
+    mime["From"] = sender
+    mime["To"] = message.recipient
+    mime["Subject"] = message.subject
+    mime.attach(MIMEText(message.body or "", "html"))
+    return mime.as_string()
+
+
+class SMTPConnection:
+    """One SMTP session, opened on first use and reused for a whole batch"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.server = None
+
+    def open(self):
+        settings = self.settings
+        if settings["use_ssl"]:
+            server = smtplib.SMTP_SSL(
+                settings["server"], settings["port"], timeout=SMTP_TIMEOUT
+            )
+        else:
+            server = smtplib.SMTP(
+                settings["server"], settings["port"], timeout=SMTP_TIMEOUT
+            )
+            if settings["starttls"]:
+                server.starttls()
+        try:
+            if settings["username"]:
+                server.login(settings["username"], settings["password"] or "")
+        except BaseException:
+            server.close()
+            raise
+        self.server = server
+
+    def send(self, recipient, data):
+        if self.server is None:
+            self.open()
+        with SMTP_SEND_SECONDS.time():
+            self.server.sendmail(self.settings["sender"], recipient, data)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+
+def _is_permanent(error):
+    """5xx replies about this particular message will not succeed on retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return error.smtp_code >= 500
+    return False
+
+
+def _is_message_error(error):
+    """Errors that concern one message and leave the session usable"""
+    return isinstance(
+        error,
+        (
+            smtplib.SMTPRecipientsRefused,
+            smtplib.SMTPSenderRefused,
+            smtplib.SMTPDataError,
+        ),
+    )
+
+
+def _mark_sent(message):
+    message.status = SENT
+    message.sent_at = datetime.utcnow()
+    message.last_error = None
+    # The body may carry credentials; nothing needs it once delivered.
+    message.body = None
+
+
+def _mark_attempt_failed(message, error):
+    message.attempts += 1
+    message.last_error = str(error)[:500] or error.__class__.__name__
+    if _is_permanent(error) or message.attempts >= MAIL_MAX_ATTEMPTS:
+        message.status = FAILED
+        message.body = None
+    else:
+        message.status = PENDING
+        message.next_attempt_at = datetime.utcnow() + retry_delay(message.attempts)
+
+
+def deliver_outbox(batch_size=MAIL_BATCH_SIZE):
+    """
+    Send one batch of due messages over a single SMTP connection.
+
+    Returns (claimed, sent). A message-level rejection only affects that
+    message; a connection or authentication failure puts the current
+    message on backoff and hands the rest of the batch back untouched.
+    """
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0, 0
+
+    sent = 0
+    connection = SMTPConnection(smtp_settings())
+    try:
+        for index, message in enumerate(messages):
+            try:
+                connection.send(
+                    message.recipient,
+                    build_message(connection.settings["sender"], message),
+                )
+            except (smtplib.SMTPException, OSError) as e:
+                current_app.logger.warning(
+                    "Email %s to %s failed: %s", message.id, message.recipient, e
+                )
+                _mark_attempt_failed(message, e)
+                if not _is_message_error(e):
+                    connection.close()
+                    retry_at = datetime.utcnow() + retry_delay(message.attempts)
+                    for remaining in messages[index + 1 :]:
+                        remaining.status = PENDING
+                        remaining.next_attempt_at = retry_at
+                    db.session.commit()
+                    break
+            else:
+                _mark_sent(message)
+                sent += 1
+            db.session.commit()
+    finally:
+        connection.close()
+    return len(messages), sent
+
+
+def drain_outbox():
+    """Deliver batches until nothing is due; returns the number sent"""
+    total = 0
+    while True:
+        claimed, sent = deliver_outbox()
+        total += sent
+        if claimed < MAIL_BATCH_SIZE or not sent:
+            return total
+
+
+def _deliver_forever(app):
+    while True:
+        _wakeup.wait(MAIL_POLL_INTERVAL)
+        _wakeup.clear()
+        try:
+            with app.app_context():
+                drain_outbox()
+        except Exception as e:
+            app.logger.error("Email delivery failed: %s", e)
+
+
+def init_mail(app):
+    if MAIL_WORKER:
+        register_job(app, "mail-outbox", _deliver_forever, app)
+
+    @app.cli.command("send-outbox")
+    def send_outbox():
+        """Deliver every due message in the email outbox once."""
+        sent = drain_outbox()
+        click.echo(f"Sent {sent} emails.")
@@ -0,0 +1,95 @@
+import os
+import time
+
+from flask import Response, abort, g, request
+from flask_login import current_user
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+# Set by gunicorn.conf.py. Each worker then writes its samples to files in
+# this directory and a scrape of any worker adds up every process.
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+LOOPBACK = ("127.0.0.1", "::1")
+
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by endpoint",
+    ["endpoint", "method"],
+)
+REQUESTS = Counter(
+    "http_requests",
+    "Requests handled, by endpoint and response status",
+    ["endpoint", "method", "status"],
+)
+SQL_QUERY_SECONDS = Histogram(
+    "sql_query_duration_seconds", "Time spent in SQL statements", buckets=SQL_BUCKETS
+)
+UPLOAD_BYTES = Counter(
+    "upload_bytes", "Case file bytes received, by upload path", ["path"]
+)
+DOWNLOAD_BYTES = Counter(
+    "download_bytes", "Case file bytes served, by download mode", ["mode"]
+)
+PASSWORD_CHECK_SECONDS = Histogram(
+    "password_check_duration_seconds", "Time spent verifying password hashes"
+)
+SMTP_SEND_SECONDS = Histogram(
+    "smtp_send_duration_seconds", "Time spent sending one email over SMTP"
+)
+
+
+def _can_scrape():
+    if current_user.is_authenticated and current_user.is_admin:
+        return True
+    # A scraper talking to gunicorn directly; nginx always adds
+    # X-Forwarded-For, so nothing relayed from outside gets through.
+    return request.remote_addr in LOOPBACK and "X-Forwarded-For" not in request.headers
+
+
+def render_metrics():
+    if METRICS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=METRICS_DIR)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def init_metrics(app):
+    """
+    Time every request by endpoint and serve everything recorded in the
+    Prometheus text format at /metrics, to admins and local scrapers.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(
+            time.perf_counter() - started
+        )
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        if not _can_scrape():
+            abort(404)
+        return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
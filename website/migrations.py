@@ -0,0 +1,180 @@
+import sys
+
+import click
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+
+from .models import SchemaMigration
+
+
+schema_migrations = SchemaMigration.__table__
+
+# (version, name, apply) in the order they were written. apply(connection,
+# metadata) must be idempotent: on SQLite most DDL is not transactional, so
+# a migration interrupted half way is simply run again.
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(apply):
+        MIGRATIONS.append((version, name, apply))
+        return apply
+
+    return register
+
+
+def add_column(connection, metadata, table_name, column_name):
+    """
+    ALTER TABLE ADD COLUMN for a model column the table does not have yet.
+    The column must be nullable or carry a server_default.
+    """
+    existing = {
+        column["name"] for column in inspect(connection).get_columns(table_name)
+    }
+    if column_name in existing:
+        return
+    column = metadata.tables[table_name].c[column_name]
+    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+    print(f"Added column {table_name}.{column_name}")
+
+
+# Indexes that shipped migrations create but the models no longer declare,
+# as name -> (table, columns). A later migration drops each of them.
+RETIRED_INDEXES = {
+    "ix_notes_case_id": ("notes", ("case_id",)),
+    "ix_notes_court_id": ("notes", ("court_id",)),
+    "ix_notes_creator_id": ("notes", ("creator_id",)),
+}
+
+
+def create_indexes(connection, metadata, *names):
+    """Create indexes declared on the models, by name, unless they exist"""
+    indexes = {
+        index.name: index for table in metadata.sorted_tables for index in table.indexes
+    }
+    for name in names:
+        if name in indexes:
+            indexes[name].create(connection, checkfirst=True)
+        else:
+            table_name, columns = RETIRED_INDEXES[name]
+            connection.execute(
+                text(
+                    f"CREATE INDEX IF NOT EXISTS {name} "
+                    f"ON {table_name} ({', '.join(columns)})"
+                )
+            )
+        print(f"Ensured index {name}")
+
+
+@migration(1, "Add content hash and physical usage columns")
+def add_blob_columns(connection, metadata):
+    add_column(connection, metadata, "case_files", "sha256")
+    add_column(connection, metadata, "storage_usage", "physical_bytes")
+
+
+@migration(2, "Index note ordering and case/court lookups")
+def add_listing_indexes(connection, metadata):
+    create_indexes(
+        connection,
+        metadata,
+        "ix_notes_date_time_id",
+        "ix_cases_title_nocase",
+        "ix_cases_full_name_nocase",
+        "ix_cases_phone_nocase",
+        "ix_courts_title_nocase",
+    )
+
+
+@migration(3, "Index notes, cases and case_files foreign keys and status")
+def add_access_path_indexes(connection, metadata):
+    create_indexes(
+        connection,
+        metadata,
+        "ix_notes_case_id",
+        "ix_notes_court_id",
+        "ix_notes_creator_id",
+        "ix_notes_status_date_time",
+        "ix_cases_creator_id",
+        "ix_case_files_case_id",
+        "ix_case_files_sha256",
+    )
+
+
+@migration(4, "Extend note foreign key indexes over (date, time)")
+def add_calendar_indexes(connection, metadata):
+    create_indexes(
+        connection,
+        metadata,
+        "ix_notes_case_date_time",
+        "ix_notes_court_date_time",
+        "ix_notes_creator_date_time",
+    )
+    # Superseded by the composites above, which lead with the same column.
+    for name in ("ix_notes_case_id", "ix_notes_court_id", "ix_notes_creator_id"):
+        connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def applied_versions(engine):
+    with engine.connect() as connection:
+        return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade_database(engine, metadata):
+    """
+    Create missing tables, then apply pending migrations in order and
+    return the versions applied.
+
+    A database created from scratch already matches the models, so it is
+    only stamped with every version. If two processes upgrade at once, the
+    loser of the version insert skips that migration.
+    """
+    fresh = not inspect(engine).get_table_names()
+    metadata.create_all(engine)
+
+    applied = applied_versions(engine)
+    done = []
+    for version, name, apply in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                if not fresh:
+                    apply(connection, metadata)
+                connection.execute(
+                    schema_migrations.insert().values(version=version, name=name)
+                )
+        except IntegrityError:
+            continue
+        done.append(version)
+    return done
+
+
+def init_migrations(app, db):
+    with app.app_context():
+        upgrade_database(db.engine, db.metadata)
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """Apply pending schema migrations."""
+        done = upgrade_database(db.engine, db.metadata)
+        if done:
+            click.echo(f"Applied migrations {', '.join(map(str, done))}.")
+        else:
+            click.echo("Database is up to date.")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """Fail if a hot query's plan falls back to a full scan or temp sort."""
+        from .queryplans import check_query_plans
+
+        failed = False
+        for name, details, problems in check_query_plans(db.engine):
+            status = "FAIL" if problems else "ok"
+            click.echo(f"[{status}] {name}")
+            for detail in details:
+                click.echo(f"    {detail}")
+            failed = failed or bool(problems)
+        if failed:
+            sys.exit(1)
@@ -5,6 +5,12 @@ from flask_login import UserMixin
 
 class Case(db.Model):
     __tablename__ = "cases"
+    __table_args__ = (
+        db.Index("ix_cases_title_nocase", db.text("title COLLATE NOCASE")),
+        db.Index("ix_cases_full_name_nocase", db.text("full_name COLLATE NOCASE")),
+        db.Index("ix_cases_phone_nocase", db.text("phone COLLATE NOCASE")),
+        db.Index("ix_cases_creator_id", "creator_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     details = db.Column(db.String(100), nullable=False)
@@ -18,6 +24,9 @@ class Case(db.Model):
 
 class Court(db.Model):
     __tablename__ = "courts"
+    __table_args__ = (
+        db.Index("ix_courts_title_nocase", db.text("title COLLATE NOCASE")),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     address = db.Column(db.String(100), nullable=False)
@@ -26,6 +35,13 @@ class Court(db.Model):
 
 class Note(db.Model):
     __tablename__ = "notes"
+    __table_args__ = (
+        db.Index("ix_notes_date_time_id", "date", "time", "id"),
+        db.Index("ix_notes_case_date_time", "case_id", "date", "time"),
+        db.Index("ix_notes_court_date_time", "court_id", "date", "time"),
+        db.Index("ix_notes_creator_date_time", "creator_id", "date", "time"),
+        db.Index("ix_notes_status_date_time", "status", "date", "time"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_name = db.Column(db.String(100), nullable=False)
     case_title = db.Column(db.String(100), nullable=False)
@@ -61,9 +77,82 @@ class User(db.Model, UserMixin):
 
 class CaseFile(db.Model):
     __tablename__ = "case_files"
+    __table_args__ = (
+        db.Index("ix_case_files_case_id", "case_id"),
+        db.Index("ix_case_files_sha256", "sha256"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     original_filename = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
     upload_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     case_id = db.Column(db.Integer, db.ForeignKey("cases.id"), nullable=False)
+    sha256 = db.Column(db.String(64), db.ForeignKey("blobs.sha256"), nullable=True)
+
+
+class Blob(db.Model):
+    __tablename__ = "blobs"
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class StorageUsage(db.Model):
+    __tablename__ = "storage_usage"
+    id = db.Column(db.Integer, primary_key=True)
+    used_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    physical_bytes = db.Column(db.BigInteger, nullable=False, server_default="0")
+    file_count = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+
+
+class UploadSession(db.Model):
+    __tablename__ = "upload_sessions"
+    id = db.Column(db.String(32), primary_key=True)
+    original_filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    case_id = db.Column(db.Integer, db.ForeignKey("cases.id"), nullable=False)
+    creator_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+
+
+class OutboxEmail(db.Model):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+        db.Index("ix_email_outbox_user_id", "user_id"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500), nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+
+
+class LoginAttempt(db.Model):
+    __tablename__ = "login_attempts"
+    key = db.Column(db.String(200), primary_key=True)
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    window_start = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migrations"
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,80 @@
+import click
+from sqlalchemy import or_, select, update
+
+from . import db
+from .models import Case, Court, Note
+
+
+# Note columns copied from their Case / Court when a note is saved.
+CASE_COPIES = {"client_name": "full_name", "case_title": "title"}
+COURT_COPIES = {"court_name": "title", "court_address": "address"}
+
+
+def _changed(copies, source):
+    """Only touch notes whose copy differs, which keeps FTS trigger work down"""
+    return or_(
+        *(
+            getattr(Note, column) != getattr(source, attribute)
+            for column, attribute in copies.items()
+        )
+    )
+
+
+def _propagate(foreign_key, copies, source):
+    statement = (
+        update(Note)
+        .where(foreign_key == source.id, _changed(copies, source))
+        .values(
+            {column: getattr(source, attribute) for column, attribute in copies.items()}
+        )
+    )
+    return db.session.execute(statement).rowcount
+
+
+def propagate_case(case):
+    """
+    Copy an edited case onto its notes with one UPDATE in the current
+    transaction; the caller commits. Returns the number of notes changed.
+    """
+    return _propagate(Note.case_id, CASE_COPIES, case)
+
+
+def propagate_court(court):
+    """Same as propagate_case, for a court's title and address"""
+    return _propagate(Note.court_id, COURT_COPIES, court)
+
+
+def _resync(model, foreign_key, copies):
+    values = {
+        column: select(getattr(model, attribute))
+        .where(model.id == foreign_key)
+        .scalar_subquery()
+        for column, attribute in copies.items()
+    }
+    changed = or_(*(getattr(Note, column) != value for column, value in values.items()))
+    exists = select(model.id).where(model.id == foreign_key).exists()
+    statement = update(Note).where(exists, changed).values(values)
+    return db.session.execute(
+        statement, execution_options={"synchronize_session": False}
+    ).rowcount
+
+
+def resync_note_copies():
+    """
+    Rewrite every stale case/court copy on notes with two set-based UPDATEs.
+    Returns (notes fixed from cases, notes fixed from courts).
+    """
+    from_cases = _resync(Case, Note.case_id, CASE_COPIES)
+    from_courts = _resync(Court, Note.court_id, COURT_COPIES)
+    db.session.commit()
+    return from_cases, from_courts
+
+
+def init_notesync(app):
+    @app.cli.command("resync-notes")
+    def resync_notes():
+        """Refresh client, case and court names copied onto notes."""
+        from_cases, from_courts = resync_note_copies()
+        click.echo(
+            f"Updated {from_cases} notes from cases, {from_courts} notes from courts."
+        )
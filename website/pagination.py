@@ -0,0 +1,130 @@
+import base64
+import json
+import os
+from datetime import date, time
+
+from sqlalchemy import and_, collate, tuple_
+
+
+DEFAULT_PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse the requested page size and clamp it to [1, MAX_PAGE_SIZE]"""
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def _dump_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    python_type = column.type.python_type
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is time:
+        return time.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values):
+    """Serialize the sort key of a row into an opaque url-safe token"""
+    raw = json.dumps([_dump_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, columns):
+    """Parse a cursor token back into typed values, or None if it is invalid"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return tuple(
+            _load_value(column, value) for column, value in zip(columns, values)
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def prefix_match(column, prefix):
+    """
+    Case-insensitive "starts with" filter written as a range so that SQLite
+    can seek a `COLLATE NOCASE` index instead of scanning like ILIKE does.
+    """
+    value = collate(column, "NOCASE")
+    return and_(value >= prefix, value < prefix + "\U0010ffff")
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.page_size = page_size
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def paginate_keyset(
+    query, columns, after=None, before=None, page_size=None, row_key=None
+):
+    """
+    Return one page of `query` ordered by `columns` using keyset pagination.
+
+    `after` and `before` are cursor tokens taken from a previous page. The
+    cost of a page depends only on page_size as long as an index covers
+    `columns`, since rows are located by a range seek instead of OFFSET.
+    `row_key` extracts the sort key from a result row when the rows are not
+    plain model instances.
+    """
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    key = tuple_(*columns)
+    after_values = decode_cursor(after, columns)
+    before_values = decode_cursor(before, columns)
+
+    if before_values is not None:
+        rows = (
+            query.filter(key < tuple_(*before_values))
+            .order_by(*[column.desc() for column in columns])
+            .limit(page_size + 1)
+            .all()
+        )
+        has_prev = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        has_next = True
+    else:
+        if after_values is not None:
+            query = query.filter(key > tuple_(*after_values))
+        rows = query.order_by(*columns).limit(page_size + 1).all()
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        has_prev = after_values is not None
+
+    if row_key is None:
+
+        def row_key(row):
+            return [getattr(row, column.key) for column in columns]
+
+    def row_cursor(row):
+        return encode_cursor(row_key(row))
+
+    next_cursor = row_cursor(rows[-1]) if rows and has_next else None
+    prev_cursor = row_cursor(rows[0]) if rows and has_prev else None
+    return KeysetPage(rows, next_cursor, prev_cursor, page_size)
@@ -0,0 +1,152 @@
+import cProfile
+import os
+import random
+import re
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+
+PROFILER = os.getenv("PROFILER", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE") or 0)
+PROFILE_ENDPOINTS = {
+    name.strip()
+    for name in os.getenv("PROFILE_ENDPOINTS", "").split(",")
+    if name.strip()
+}
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS") or 0)
+PROFILE_DIR = os.getenv("PROFILE_DIR") or "profiles"
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP") or 100)
+
+CAPTURE_RE = re.compile(
+    r"^(?P<stamp>\d+)-(?P<endpoint>[\w.]+)-(?P<ms>\d+)ms-(?P<pid>\d+)\.pstats$"
+)
+
+
+class ProfileStore:
+    """
+    A ring of pstats captures on disk, shared by every worker on the host.
+    Everything the listing shows is encoded in the file name, so listing
+    never opens a capture; the oldest files go once there are more than
+    `keep`.
+    """
+
+    def __init__(self, directory, keep):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, profile, endpoint, duration_ms):
+        name = f"{time.time_ns()}-{endpoint}-{int(duration_ms)}ms-{os.getpid()}.pstats"
+        path = os.path.join(self.directory, name)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        profile.dump_stats(temp_path)
+        os.replace(temp_path, path)
+        self.prune()
+        return name
+
+    def captures(self):
+        """Captures newest first, as dicts for the admin listing"""
+        captures = []
+        for entry in os.scandir(self.directory):
+            match = CAPTURE_RE.match(entry.name)
+            if not match:
+                continue
+            try:
+                size = entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            captures.append(
+                {
+                    "name": entry.name,
+                    "captured_at": datetime.fromtimestamp(int(match["stamp"]) / 1e9),
+                    "endpoint": match["endpoint"],
+                    "duration_ms": int(match["ms"]),
+                    "pid": int(match["pid"]),
+                    "size": size,
+                }
+            )
+        captures.sort(key=lambda capture: capture["name"], reverse=True)
+        return captures
+
+    def path(self, name):
+        """Path of a capture, or None for anything that is not one"""
+        if not CAPTURE_RE.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+    def prune(self):
+        for capture in self.captures()[self.keep :]:
+            try:
+                os.remove(os.path.join(self.directory, capture["name"]))
+            except FileNotFoundError:
+                pass
+
+
+def _wants_profile():
+    # Admins can profile any single request on demand.
+    if request.args.get("_profile") == "1" or request.headers.get("X-Profile") == "1":
+        return current_user.is_authenticated and current_user.is_admin
+    if PROFILE_ENDPOINTS and request.endpoint not in PROFILE_ENDPOINTS:
+        return False
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+def init_profiler(app):
+    """
+    With PROFILER=1, run cProfile over a PROFILE_SAMPLE_RATE share of the
+    requests to PROFILE_ENDPOINTS (all endpoints if unset), and over any
+    admin request sent with ?_profile=1 or X-Profile: 1. Captures slower
+    than PROFILE_MIN_MS are kept in the store the admin Profiles page
+    lists. When PROFILER is off no hook is installed at all.
+
+    A streamed response is only profiled up to the point it is returned.
+    """
+    directory = PROFILE_DIR
+    if not os.path.isabs(directory):
+        directory = os.path.join(app.instance_path, directory)
+    store = ProfileStore(directory, PROFILE_KEEP)
+    app.extensions["profile_store"] = store
+
+    if not PROFILER:
+        return
+
+    @app.before_request
+    def start_profile():
+        if not _wants_profile():
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another thread of this worker is being profiled.
+            return
+        g.profile = (profile, time.perf_counter())
+
+    @app.after_request
+    def save_profile(response):
+        started = g.pop("profile", None)
+        if started is None:
+            return response
+        profile, start = started
+        profile.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= PROFILE_MIN_MS:
+            endpoint = request.endpoint or "unmatched"
+            try:
+                name = store.save(profile, endpoint, duration_ms)
+            except OSError as e:
+                app.logger.error("Saving profile failed: %s", e)
+            else:
+                response.headers["X-Profile-Capture"] = name
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        started = g.pop("profile", None)
+        if started is not None:
+            started[0].disable()
@@ -0,0 +1,78 @@
+import re
+from datetime import date
+
+from sqlalchemy import or_, select, text
+
+from .models import Case, CaseFile, Court, Note
+from .pagination import prefix_match
+
+
+NOTE_ORDER = (Note.date, Note.time, Note.id)
+
+
+def _hot_queries():
+    """The queries behind listings, existence checks and lookups"""
+    month = (date(2024, 1, 1), date(2024, 1, 31))
+    return {
+        "home page": select(Note.id).order_by(*NOTE_ORDER).limit(51),
+        "schedule by date range": select(Note.id)
+        .where(Note.date.between(*month))
+        .order_by(*NOTE_ORDER),
+        "schedule by status": select(Note.id)
+        .where(Note.status == "pending", Note.date.between(*month))
+        .order_by(Note.date, Note.time),
+        "calendar for a court": select(Note.id)
+        .where(Note.court_id == 1, Note.date.between(*month))
+        .order_by(*NOTE_ORDER),
+        "calendar for a creator": select(Note.id)
+        .where(Note.creator_id == 1, Note.date.between(*month))
+        .order_by(*NOTE_ORDER),
+        "calendar for a case": select(Note.id)
+        .where(Note.case_id == 1, Note.date.between(*month))
+        .order_by(*NOTE_ORDER),
+        "notes of a case": select(Note.id).where(Note.case_id == 1).limit(1),
+        "notes of a court": select(Note.id).where(Note.court_id == 1).limit(1),
+        "notes of a creator": select(Note.id).where(Note.creator_id == 1),
+        "cases of a creator": select(Case.id).where(Case.creator_id == 1),
+        "files of a case": select(CaseFile.id).where(CaseFile.case_id == 1),
+        "blob references": select(CaseFile.id).where(CaseFile.sha256 == "0" * 64),
+        "case lookup": select(Case.id).where(
+            or_(
+                prefix_match(Case.title, "ab"),
+                prefix_match(Case.full_name, "ab"),
+                prefix_match(Case.phone, "ab"),
+            )
+        ),
+        "court lookup": select(Court.id).where(prefix_match(Court.title, "ab")),
+    }
+
+
+# A bare "SCAN <table>" reads every row; "SCAN <table> USING INDEX" walks
+# an index in order and is fine for ORDER BY ... LIMIT.
+FULL_SCAN_RE = re.compile(r"^SCAN \w+$")
+
+
+def explain(connection, statement):
+    sql = str(
+        statement.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(details):
+    return [
+        detail
+        for detail in details
+        if FULL_SCAN_RE.match(detail) or detail.startswith("USE TEMP B-TREE")
+    ]
+
+
+def check_query_plans(engine):
+    """Yield (name, plan details, problems) for each hot query"""
+    with engine.connect() as connection:
+        for name, statement in _hot_queries().items():
+            details = explain(connection, statement)
+            yield name, details, plan_problems(details)
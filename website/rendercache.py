@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from flask import current_app, g, render_template, request
+from flask_login import current_user
+from markupsafe import Markup
+
+from .versions import read_versions
+
+
+RENDER_CACHE_ENTRIES = int(os.getenv("RENDER_CACHE_ENTRIES") or 256)
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or ""
+RENDER_CACHE_DISK_ENTRIES = int(os.getenv("RENDER_CACHE_DISK_ENTRIES") or 2048)
+
+# The disk tier is pruned to RENDER_CACHE_DISK_ENTRIES after this many writes.
+DISK_PRUNE_EVERY = 64
+
+
+class RenderCache:
+    """
+    Rendered HTML fragments keyed by content version.
+
+    Keys embed the versions of the tables a fragment was built from, so
+    entries never need invalidating: a write bumps the version and the old
+    entry simply stops being asked for and ages out. The first tier is a
+    per-process LRU; the optional disk tier is shared by every worker on
+    the host, so a fragment rendered by one worker is reused by the rest.
+    """
+
+    def __init__(self, max_entries, directory=None, max_disk_entries=0):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return value
+        if self.directory:
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as cached:
+                    value = cached.read()
+            except FileNotFoundError:
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self.counters["disk_hits"] += 1
+                return value
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if not self.directory:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cached:
+            cached.write(value)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_EVERY == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Drop the least recently written files beyond max_disk_entries"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".html"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_disk_entries :]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries))
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (
+            round((stats["hits"] + stats["disk_hits"]) / lookups, 4)
+            if lookups
+            else None
+        )
+        stats["disk"] = bool(self.directory)
+        return stats
+
+
+def _scope(per_user):
+    if current_user.is_admin:
+        return "admin"
+    return f"user:{current_user.get_id()}" if per_user else "user"
+
+
+def cached_fragment(template, tables, build_context, per_user=True):
+    """
+    Render `template` with build_context() unless a fragment for the same
+    table versions, URL and permission scope is cached. build_context only
+    runs on a miss, so a hit skips the listing's queries as well as Jinja.
+    Set per_user=False when the fragment only depends on the admin flag.
+    """
+    # versioned_listing has usually read these already for the ETag.
+    versions = g.get("table_versions", {})
+    if not all(name in versions for name in tables):
+        versions = read_versions(tables)
+    parts = [
+        current_app.extensions["templates_stamp"],
+        template,
+        request.full_path,
+        _scope(per_user),
+    ] + [f"{name}={versions.get(name, 0)}" for name in tables]
+    key = hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+    cache = current_app.extensions["render_cache"]
+    html = cache.get(key)
+    if html is None:
+        html = render_template(template, **build_context())
+        cache.set(key, html)
+    return Markup(html)
+
+
+def init_render_cache(app):
+    directory = RENDER_CACHE_DIR
+    if directory and not os.path.isabs(directory):
+        directory = os.path.join(app.instance_path, directory)
+    app.extensions["render_cache"] = RenderCache(
+        RENDER_CACHE_ENTRIES, directory or None, RENDER_CACHE_DISK_ENTRIES
+    )
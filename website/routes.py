@@ -1,31 +1,73 @@
-from flask import Blueprint, render_template, request, flash, jsonify, redirect, url_for
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    flash,
+    jsonify,
+    redirect,
+    url_for,
+    current_app,
+    Response,
+    stream_with_context,
+)
 from flask_login import login_required, current_user
 from . import db
-from .models import Case, Court, Note
+from .models import Case, Court, Note, User
 from .utils import (
-    has_sql_injection,
     is_number,
-    is_valid_range,
     is_valid_date,
-    is_valid_time,
     allowed_file,
-    is_file_size_allowed,
-    get_storage_stats,
-    is_storage_available,
+    get_file_size,
     STORAGE_LIMIT,
     ALLOWED_EXTENSIONS,
     MAX_FILE_SIZE,
     admin_required,
 )
+from .validation import (
+    CASE_SCHEMA,
+    COURT_SCHEMA,
+    NOTE_SCHEMA,
+    CALENDAR_SCHEMA,
+    NOTE_STATUSES,
+)
+from .schedule import calendar_range, calendar_query, calendar_today, group_by_day
+from .versions import versioned_listing
+from .rendercache import cached_fragment
+from .notesync import propagate_case, propagate_court
+from .pagination import paginate_keyset, get_page_size, prefix_match
+from .fulltext import build_match_query, note_match_subquery
+from .storage import get_storage_stats, is_storage_available
+from .blobs import (
+    save_to_temp,
+    add_blob_reference,
+    release_blob_reference,
+)
+from .downloads import serve_case_file, content_disposition
+from .metrics import UPLOAD_BYTES
+from .export import (
+    stream_csv,
+    stream_xlsx,
+    export_filename,
+    EXPORT_BATCH_SIZE,
+    CSV_MIMETYPE,
+    XLSX_MIMETYPE,
+)
+from .uploads import (
+    UploadError,
+    UPLOAD_CHUNK_SIZE,
+    create_upload_session,
+    write_chunk,
+    finish_upload,
+    abort_upload,
+    locked_upload,
+)
 import json
 from sqlalchemy.orm import joinedload
-from sqlalchemy import or_
-from datetime import datetime, date, time
+from sqlalchemy import or_, collate, select, update, delete
+from datetime import date
 
 from werkzeug.utils import secure_filename
-from datetime import datetime
-from .models import CaseFile
-from flask import send_file
+from .models import CaseFile, UploadSession
 import os
 
 routes = Blueprint("routes", __name__)
@@ -35,103 +77,235 @@ UPLOAD_FOLDER = os.path.join(
 )
 
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+def upload_folder():
+    """The app's UPLOAD_FOLDER, which defaults to UPLOAD_FOLDER above"""
+    return current_app.config["UPLOAD_FOLDER"]
+
+
+NOTE_ORDER = (Note.date, Note.time, Note.id)
+
+
+def paginate_notes(query):
+    return paginate_keyset(
+        query,
+        NOTE_ORDER,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        page_size=get_page_size(request.args.get("per_page")),
+    )
+
+
+def note_like_filter(search_query):
+    return or_(
+        Note.client_name.ilike(f"%{search_query}%"),
+        Note.case_title.ilike(f"%{search_query}%"),
+        Note.court_address.ilike(f"%{search_query}%"),
+        Note.court_name.ilike(f"%{search_query}%"),
+        Note.details.ilike(f"%{search_query}%"),
+        Note.date.ilike(f"%{search_query}%"),
+        Note.time.ilike(f"%{search_query}%"),
+        Note.status.ilike(f"%{search_query}%"),
+    )
+
+
+def note_search_filter(search_query):
+    """Same matching as search(), as a plain WHERE criterion"""
+    match_query = build_match_query(search_query)
+    if current_app.extensions.get("note_fts") and match_query:
+        matches = note_match_subquery(match_query)
+        return Note.id.in_(select(matches.c.id))
+    return note_like_filter(search_query)
 
 
 @routes.route("/", methods=["GET"])
 @login_required
+@versioned_listing("notes", "user")
 def home():
     try:
-        notes = Note.query.all()
-        return render_template("home.html", user=current_user, notes=notes)
+
+        def listing_context():
+            page = paginate_notes(Note.query.options(joinedload(Note.creator)))
+            return {"user": current_user, "notes": page.items, "page": page}
+
+        listing = cached_fragment(
+            "notes-listing.html", ("notes", "user"), listing_context
+        )
+        return render_template("home.html", user=current_user, listing=listing)
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
 
-@routes.route("/search", methods=["POST"])
+@routes.route("/search", methods=["GET", "POST"])
 @login_required
 def search():
     try:
-        search_query = request.form.get("search")
-        notes = Note.query.filter(
-            or_(
-                Note.client_name.ilike(f"%{search_query}%"),
-                Note.case_title.ilike(f"%{search_query}%"),
-                Note.court_address.ilike(f"%{search_query}%"),
-                Note.court_name.ilike(f"%{search_query}%"),
-                Note.details.ilike(f"%{search_query}%"),
-                Note.date.ilike(f"%{search_query}%"),
-                Note.time.ilike(f"%{search_query}%"),
-                Note.status.ilike(f"%{search_query}%"),
+        search_query = request.values.get("search", "")
+        match_query = build_match_query(search_query)
+        if current_app.extensions.get("note_fts") and match_query:
+            matches = note_match_subquery(match_query)
+            query = (
+                db.session.query(Note, matches.c.rank)
+                .join(matches, matches.c.id == Note.id)
+                .options(joinedload(Note.creator))
             )
-        ).all()
+            page = paginate_keyset(
+                query,
+                (matches.c.rank, Note.id),
+                after=request.args.get("after"),
+                before=request.args.get("before"),
+                page_size=get_page_size(request.args.get("per_page")),
+                row_key=lambda row: (row.rank, row.Note.id),
+            )
+            notes = [row.Note for row in page.items]
+        else:
+            query = Note.query.options(joinedload(Note.creator)).filter(
+                note_like_filter(search_query)
+            )
+            page = paginate_notes(query)
+            notes = page.items
+
+        return render_template(
+            "home.html",
+            user=current_user,
+            notes=notes,
+            page=page,
+            search_query=search_query,
+        )
+
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
+LOOKUP_PAGE_SIZE = 20
+
+
+def lookup_response(query, model, serialize):
+    # Ordered the same way as the NOCASE title index so the first page of an
+    # empty query is an index walk rather than a sort of the whole table.
+    page = paginate_keyset(
+        query,
+        (collate(model.title, "NOCASE"), model.id),
+        after=request.args.get("after"),
+        page_size=get_page_size(request.args.get("per_page"), LOOKUP_PAGE_SIZE),
+        row_key=lambda item: (item.title, item.id),
+    )
+    return jsonify(
+        {
+            "results": [serialize(item) for item in page.items],
+            "next": page.next_cursor,
+        }
+    )
+
+
+@routes.route("/lookup/cases", methods=["GET"])
+@login_required
+def lookup_cases():
+    try:
+        search_query = request.args.get("q", "").strip()
+        query = Case.query
+        if search_query:
+            query = query.filter(
+                or_(
+                    prefix_match(Case.title, search_query),
+                    prefix_match(Case.full_name, search_query),
+                    prefix_match(Case.phone, search_query),
+                )
+            )
+        return lookup_response(
+            query,
+            Case,
+            lambda case: {
+                "id": case.id,
+                "title": case.title,
+                "full_name": case.full_name,
+                "phone": case.phone,
+            },
+        )
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
 
-        return render_template("home.html", user=current_user, notes=notes)
 
+@routes.route("/lookup/courts", methods=["GET"])
+@login_required
+def lookup_courts():
+    try:
+        search_query = request.args.get("q", "").strip()
+        query = Court.query
+        if search_query:
+            query = query.filter(prefix_match(Court.title, search_query))
+        return lookup_response(
+            query,
+            Court,
+            lambda court: {"id": court.id, "title": court.title},
+        )
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
 
-allowed_status = {"resolved": True, "pending": True, "rejected": True}
+@routes.route("/api/calendar", methods=["GET"])
+@login_required
+@versioned_listing("notes", vary=calendar_today)
+def calendar():
+    try:
+        args = request.args.to_dict()
+        if args.get("creator_id") == "me":
+            args["creator_id"] = str(current_user.id)
+        values, errors = CALENDAR_SCHEMA.validate(args)
+        if errors:
+            return jsonify({"error": "Invalid filter", "fields": errors}), 400
+        try:
+            start, end = calendar_range(values)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        rows = db.session.execute(calendar_query(start, end, values))
+        return jsonify(
+            {
+                "from": start.isoformat(),
+                "to": end.isoformat(),
+                "days": group_by_day(rows),
+            }
+        )
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
 
 
 @routes.route("/new-note", methods=["GET", "POST"])
 @login_required
 def new_note():
     try:
-        cases = Case.query.all()
-        courts = Court.query.all()
+        case = court = None
         if request.method == "POST":
-            case_id = request.form.get("case_id")
-            court_id = request.form.get("court_id")
-            status = request.form.get("status")
-            details = request.form.get("details")
-            date_str = request.form.get("date")
-            time_str = request.form.get("time")
-
-            if (
-                not case_id
-                or not is_number(case_id)
-                or not court_id
-                or not is_number(court_id)
-                or not status
-                or not allowed_status.get(status)
-                or not date_str
-                or not is_valid_date(date_str)
-                or not time_str
-                or not is_valid_time(time_str)
-            ):
+            values, errors = NOTE_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
             else:
-                case = Case.query.get(case_id)
-                court = Court.query.get(court_id)
+                case = db.session.get(Case, values["case_id"])
+                court = db.session.get(Court, values["court_id"])
                 if not case or not court:
                     flash("Case or Court not found.", category="error")
                     return render_template(
-                        "new-note.html", user=current_user, cases=cases, courts=courts
+                        "new-note.html", user=current_user, case=case, court=court
                     )
 
-                date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                time = datetime.strptime(time_str, "%H:%M").time()
-
                 new_note = Note(
                     client_name=case.full_name,
                     case_title=case.title,
                     court_address=court.address,
                     court_name=court.title,
-                    details=details,
-                    date=date,
-                    time=time,
-                    status=status,
-                    case_id=case_id,
-                    court_id=court_id,
+                    details=values["details"],
+                    date=values["date"],
+                    time=values["time"],
+                    status=values["status"],
+                    case_id=case.id,
+                    court_id=court.id,
                     creator_id=current_user.id,
                 )
                 db.session.add(new_note)
                 db.session.commit()
                 flash("Note created!", category="success")
         return render_template(
-            "new-note.html", user=current_user, cases=cases, courts=courts
+            "new-note.html", user=current_user, case=case, court=court
         )
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
@@ -141,9 +315,7 @@ def new_note():
 @login_required
 def edit_note(id):
     try:
-        cases = Case.query.all()
-        courts = Court.query.all()
-        note = Note.query.get(id)
+        note = db.session.get(Note, id)
         if not note:
             return redirect(url_for("routes.view_courts"))
 
@@ -151,64 +323,41 @@ def edit_note(id):
             flash("You don't have permission to edit this note.", category="error")
             return redirect(url_for("routes.home"))
 
+        case = note.case
+        court = note.court
         if request.method == "POST":
-            case_id = request.form.get("case_id")
-            court_id = request.form.get("court_id")
-            status = request.form.get("status")
-            details = request.form.get("details")
-            date_str = request.form.get("date")
-            time_str = request.form.get("time")
-            print(status)
-            print(time_str)
-
-            if (
-                not case_id
-                or not is_number(case_id)
-                or not court_id
-                or not is_number(court_id)
-                or not status
-                or not allowed_status.get(status)
-                or not date_str
-                or not is_valid_date(date_str)
-                or not time_str
-                or not is_valid_time(time_str)
-            ):
+            values, errors = NOTE_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
             else:
-                case = Case.query.get(case_id)
-                court = Court.query.get(court_id)
+                case = db.session.get(Case, values["case_id"])
+                court = db.session.get(Court, values["court_id"])
                 if not case or not court:
                     flash("Case or Court not found.", category="error")
                     return render_template(
                         "edit-note.html",
                         user=current_user,
                         note=note,
-                        cases=cases,
-                        courts=courts,
+                        case=case or note.case,
+                        court=court or note.court,
                     )
 
-                date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                try:
-                    time = datetime.strptime(time_str, "%H:%M:%S").time()
-                except ValueError:
-                    time = datetime.strptime(time_str, "%H:%M").time()
-
                 note.client_name = case.full_name
                 note.case_title = case.title
                 note.court_address = court.address
                 note.court_name = court.title
-                note.details = details
-                note.date = date
-                note.time = time
-                note.status = status
-                note.case_id = case_id
-                note.court_id = court_id
+                note.details = values["details"]
+                note.date = values["date"]
+                note.time = values["time"]
+                note.status = values["status"]
+                note.case_id = case.id
+                note.court_id = court.id
                 db.session.commit()
                 flash("Note edited!", category="success")
                 return redirect(url_for("routes.view_courts"))
 
         return render_template(
-            "edit-note.html", user=current_user, note=note, cases=cases, courts=courts
+            "edit-note.html", user=current_user, note=note, case=case, court=court
         )
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
@@ -238,32 +387,259 @@ def delete_note():
         return jsonify({"Error": str(e)}), 500
 
 
+# Upper bound on the ids of one bulk request, which all go into one IN list.
+BULK_NOTE_LIMIT = 1000
+
+
+def bulk_note_ids(data):
+    """The de-duplicated integer ids of a bulk request, or raise ValueError"""
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("ids must be a non-empty list")
+    if len(ids) > BULK_NOTE_LIMIT:
+        raise ValueError(f"At most {BULK_NOTE_LIMIT} notes at a time")
+    try:
+        return sorted({int(note_id) for note_id in ids})
+    except (TypeError, ValueError):
+        raise ValueError("ids must be note ids")
+
+
+def editable_notes_filter(ids):
+    """Notes among `ids` the current user may change: admins any, others own"""
+    criterion = Note.id.in_(ids)
+    if not current_user.is_admin:
+        criterion = criterion & (Note.creator_id == current_user.id)
+    return criterion
+
+
+def bulk_note_response(ids, affected, key):
+    affected = sorted(affected)
+    skipped = sorted(set(ids) - set(affected))
+    return jsonify({key: affected, "skipped": skipped}), 200
+
+
+@routes.route("/notes/bulk-status", methods=["POST"])
+@login_required
+def bulk_update_note_status():
+    """
+    Set the status of many notes with one UPDATE. Notes that do not exist
+    or belong to someone else are left alone and reported as skipped.
+    """
+    try:
+        data = request.get_json(silent=True)
+        try:
+            ids = bulk_note_ids(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        status = data.get("status")
+        if status not in NOTE_STATUSES:
+            return jsonify({"error": "Unknown status"}), 400
+
+        affected = db.session.execute(
+            update(Note)
+            .where(editable_notes_filter(ids))
+            .values(status=status)
+            .returning(Note.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+        affected = list(affected)
+        db.session.commit()
+        if affected:
+            flash(
+                f"Status of {len(affected)} notes set to {status}!", category="success"
+            )
+        return bulk_note_response(ids, affected, "updated")
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"Error": str(e)}), 500
+
+
+@routes.route("/notes/bulk-delete", methods=["POST"])
+@login_required
+def bulk_delete_notes():
+    """Delete many notes with one DELETE, skipping those the user can't edit"""
+    try:
+        try:
+            ids = bulk_note_ids(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        affected = db.session.execute(
+            delete(Note)
+            .where(editable_notes_filter(ids))
+            .returning(Note.id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+        affected = list(affected)
+        db.session.commit()
+        if affected:
+            flash(f"{len(affected)} notes deleted!", category="success")
+        return bulk_note_response(ids, affected, "deleted")
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"Error": str(e)}), 500
+
+
+NOTE_EXPORT_HEADERS = [
+    "# ID",
+    "Client Name",
+    "Case Title",
+    "Court Address",
+    "Court Name",
+    "Details",
+    "Date",
+    "Time",
+    "Status",
+    "Creator",
+    "Case Phone",
+    "Court ID",
+]
+
+CASE_EXPORT_HEADERS = ["# ID", "Title", "Details", "Client Name", "Phone", "Creator"]
+
+EXPORT_FORMATS = {"csv": "csv", "xlsx": "xlsx"}
+
+
+def export_response(rows, headers, prefix, sheet_name, export_format):
+    if export_format == "xlsx":
+        body = stream_xlsx(sheet_name, headers, rows)
+        mimetype = XLSX_MIMETYPE
+    else:
+        body = stream_csv(headers, rows)
+        mimetype = CSV_MIMETYPE
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = content_disposition(
+        export_filename(prefix, export_format)
+    )
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@routes.route("/export/notes.<export_format>", methods=["GET"])
+@login_required
+def export_notes(export_format):
+    """
+    Stream notes as CSV or XLSX. Accepts the home page `search` text plus
+    optional `date_from` / `date_to` (YYYY-MM-DD) bounds.
+    """
+    try:
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported export format"}), 404
+
+        query = (
+            select(
+                Note.id,
+                Note.client_name,
+                Note.case_title,
+                Note.court_address,
+                Note.court_name,
+                Note.details,
+                Note.date,
+                Note.time,
+                Note.status,
+                User.name,
+                Case.phone,
+                Note.court_id,
+            )
+            .outerjoin(User, User.id == Note.creator_id)
+            .outerjoin(Case, Case.id == Note.case_id)
+            .order_by(*NOTE_ORDER)
+        )
+        search_query = request.args.get("search", "")
+        if search_query:
+            query = query.where(note_search_filter(search_query))
+        date_from = request.args.get("date_from")
+        date_to = request.args.get("date_to")
+        if date_from:
+            if not is_valid_date(date_from):
+                return jsonify({"error": "Invalid date_from"}), 400
+            query = query.where(Note.date >= date.fromisoformat(date_from))
+        if date_to:
+            if not is_valid_date(date_to):
+                return jsonify({"error": "Invalid date_to"}), 400
+            query = query.where(Note.date <= date.fromisoformat(date_to))
+
+        rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        return export_response(
+            rows,
+            NOTE_EXPORT_HEADERS,
+            "court_schedules",
+            "Court Schedules",
+            export_format,
+        )
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
+@routes.route("/export/cases.<export_format>", methods=["GET"])
+@login_required
+def export_cases(export_format):
+    try:
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported export format"}), 404
+
+        query = (
+            select(
+                Case.id,
+                Case.title,
+                Case.details,
+                Case.full_name,
+                Case.phone,
+                User.name,
+            )
+            .outerjoin(User, User.id == Case.creator_id)
+            .order_by(Case.id)
+        )
+        search_query = request.args.get("search", "")
+        if search_query:
+            query = query.where(case_like_filter(search_query))
+
+        rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        return export_response(
+            rows, CASE_EXPORT_HEADERS, "cases", "Cases", export_format
+        )
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
 @routes.route("/view-cases", methods=["GET"])
 @login_required
+@versioned_listing("cases", "user")
 def view_cases():
     try:
-
-        cases = Case.query.all()
-        return render_template("view-cases.html", user=current_user, cases=cases)
+        listing = cached_fragment(
+            "cases-listing.html",
+            ("cases", "user"),
+            lambda: {
+                "user": current_user,
+                "cases": Case.query.options(joinedload(Case.creator)).all(),
+            },
+        )
+        return render_template("view-cases.html", user=current_user, listing=listing)
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
 
+def case_like_filter(search_query):
+    return or_(
+        Case.id.ilike(f"%{search_query}%"),
+        Case.title.ilike(f"%{search_query}%"),
+        Case.details.ilike(f"%{search_query}%"),
+        Case.full_name.ilike(f"%{search_query}%"),
+        Case.phone.ilike(f"%{search_query}%"),
+    )
+
+
 @routes.route("/search-cases", methods=["POST"])
 @login_required
 def search_cases():
     try:
-        print("view search cases!")
         search_query = request.form.get("search")
-        cases = Case.query.filter(
-            or_(
-                Case.id.ilike(f"%{search_query}%"),
-                Case.title.ilike(f"%{search_query}%"),
-                Case.details.ilike(f"%{search_query}%"),
-                Case.full_name.ilike(f"%{search_query}%"),
-                Case.phone.ilike(f"%{search_query}%"),
-            )
-        ).all()
+        cases = (
+            Case.query.options(joinedload(Case.creator))
+            .filter(case_like_filter(search_query))
+            .all()
+        )
 
         return render_template("view-cases.html", user=current_user, cases=cases)
 
@@ -276,36 +652,15 @@ def search_cases():
 def new_case():
     try:
         if request.method == "POST":
-            title = request.form.get("title")
-            details = request.form.get("details")
-            full_name = request.form.get("full_name")
-            phone = request.form.get("phone")
-            case = Case.query.filter_by(full_name=full_name, phone=phone).first()
-            if (
-                not title
-                or not is_valid_range(title, 100)
-                or has_sql_injection(title)
-                or not details
-                or not is_valid_range(details, 100)
-                or has_sql_injection(details)
-                or not full_name
-                or not is_valid_range(full_name, 100)
-                or has_sql_injection(full_name)
-                or not phone
-                or not is_valid_range(phone, 20)
-                or has_sql_injection(phone)
-            ):
+            values, errors = CASE_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
-            elif case:
+            elif Case.query.filter_by(
+                full_name=values["full_name"], phone=values["phone"]
+            ).first():
                 flash("Case already exists!", category="error")
             else:
-                new_case = Case(
-                    title=title,
-                    details=details,
-                    full_name=full_name,
-                    phone=phone,
-                    creator_id=current_user.id,
-                )
+                new_case = Case(**values, creator_id=current_user.id)
                 db.session.add(new_case)
                 db.session.commit()
                 flash("Case created!", category="success")
@@ -327,30 +682,15 @@ def edit_case(case_id):
             return redirect(url_for("routes.view_cases"))
 
         if request.method == "POST":
-            title = request.form.get("title")
-            details = request.form.get("details")
-            full_name = request.form.get("full_name")
-            phone = request.form.get("phone")
-            if (
-                not title
-                or not is_valid_range(title, 100)
-                or has_sql_injection(title)
-                or not details
-                or not is_valid_range(details, 100)
-                or has_sql_injection(details)
-                or not full_name
-                or not is_valid_range(full_name, 100)
-                or has_sql_injection(full_name)
-                or not phone
-                or not is_valid_range(phone, 20)
-                or has_sql_injection(phone)
-            ):
+            values, errors = CASE_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
             else:
-                case.title = title
-                case.details = details
-                case.full_name = full_name
-                case.phone = phone
+                case.title = values["title"]
+                case.details = values["details"]
+                case.full_name = values["full_name"]
+                case.phone = values["phone"]
+                propagate_case(case)
                 db.session.commit()
                 flash("Case edited!", category="success")
                 return redirect(url_for("routes.view_cases"))
@@ -408,7 +748,7 @@ def case_files(case_id):
         return redirect(url_for("routes.view_cases"))
 
     files = CaseFile.query.filter_by(case_id=case_id).all()
-    storage_stats = get_storage_stats(UPLOAD_FOLDER)
+    storage_stats = get_storage_stats()
     return render_template(
         "case-files.html",
         case=case,
@@ -445,29 +785,25 @@ def upload_file(case_id):
             flash("Invalid file type", category="error")
             return redirect(request.url)
 
-        if not is_file_size_allowed(file, MAX_FILE_SIZE):
+        file_size = get_file_size(file)
+        if file_size > MAX_FILE_SIZE:
             flash("File size exceeds 8MB limit", category="error")
             return redirect(request.url)
 
-        if not is_storage_available(UPLOAD_FOLDER, file.content_length):
+        if not is_storage_available(file_size):
             flash("Not enough storage space", category="error")
             return redirect(request.url)
 
         filename = secure_filename(file.filename)
-        unique_filename = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{filename}"
-
-        file.seek(0, 2)
-        file_size = file.tell()
-        file.seek(0)
-
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(file_path)
+        temp_path, sha256, file_size = save_to_temp(upload_folder(), file.stream)
+        UPLOAD_BYTES.labels("form").inc(file_size)
 
         new_file = CaseFile(
-            filename=unique_filename,
+            filename=add_blob_reference(upload_folder(), temp_path, sha256, file_size),
             original_filename=filename,
             file_size=file_size,
             case_id=case_id,
+            sha256=sha256,
         )
         db.session.add(new_file)
         db.session.commit()
@@ -480,6 +816,147 @@ def upload_file(case_id):
         return redirect(url_for("routes.case_files", case_id=case_id))
 
 
+def get_upload_session(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if not upload:
+        return None
+    if not current_user.is_admin and upload.creator_id != current_user.id:
+        return None
+    return upload
+
+
+def upload_error_response(error):
+    body = {"error": str(error)}
+    if error.offset is not None:
+        body["offset"] = error.offset
+    return jsonify(body), error.status
+
+
+@routes.route("/upload-session/<int:case_id>", methods=["POST"])
+@login_required
+def start_upload_session(case_id):
+    try:
+        case = db.session.get(Case, case_id)
+        if not case:
+            return jsonify({"error": "Case not found"}), 404
+
+        if not current_user.is_admin and case.creator_id != current_user.id:
+            return (
+                jsonify(
+                    {"error": "You don't have permission to upload files to this case"}
+                ),
+                403,
+            )
+
+        data = request.get_json(silent=True) or {}
+        filename = data.get("filename")
+        total_size = data.get("size")
+        if not filename or not isinstance(total_size, int):
+            return jsonify({"error": "Invalid form."}), 400
+        if not allowed_file(filename):
+            return jsonify({"error": "Invalid file type"}), 400
+
+        upload = create_upload_session(
+            upload_folder(), case.id, current_user.id, filename, total_size
+        )
+        return (
+            jsonify(
+                {
+                    "upload_id": upload.id,
+                    "offset": upload.received_bytes,
+                    "chunk_size": UPLOAD_CHUNK_SIZE,
+                }
+            ),
+            201,
+        )
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
+@routes.route("/upload-session/<upload_id>", methods=["GET"])
+@login_required
+def upload_session_status(upload_id):
+    upload = get_upload_session(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(
+        {
+            "upload_id": upload.id,
+            "offset": upload.received_bytes,
+            "size": upload.total_size,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+        }
+    )
+
+
+@routes.route("/upload-session/<upload_id>", methods=["PUT"])
+@login_required
+def upload_chunk(upload_id):
+    """
+    Receive one chunk. The Upload-Offset header must equal the number of
+    bytes the server already holds; on a mismatch the current offset is
+    returned with 409 so the client can resume from there.
+    """
+    try:
+        upload = get_upload_session(upload_id)
+        if not upload:
+            return jsonify({"error": "Upload not found"}), 404
+
+        offset = request.headers.get("Upload-Offset", "")
+        if not is_number(offset):
+            return jsonify({"error": "Missing Upload-Offset header"}), 400
+
+        with locked_upload(upload_folder(), upload_id) as upload:
+            if upload is None:
+                return jsonify({"error": "Upload not found"}), 404
+            write_chunk(
+                upload_folder(),
+                upload,
+                int(offset),
+                request.stream,
+                request.content_length,
+            )
+            if upload.received_bytes < upload.total_size:
+                return jsonify({"offset": upload.received_bytes}), 200
+
+            case_id = upload.case_id
+            case_file, checksum = finish_upload(
+                upload_folder(), upload, request.headers.get("Upload-Checksum-SHA256")
+            )
+        flash("File uploaded successfully!", category="success")
+        return (
+            jsonify(
+                {
+                    "file_id": case_file.id,
+                    "offset": case_file.file_size,
+                    "sha256": checksum,
+                    "redirect": url_for("routes.case_files", case_id=case_id),
+                }
+            ),
+            201,
+        )
+    except UploadError as e:
+        return upload_error_response(e)
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
+@routes.route("/upload-session/<upload_id>", methods=["DELETE"])
+@login_required
+def cancel_upload_session(upload_id):
+    try:
+        if not get_upload_session(upload_id):
+            return jsonify({"error": "Upload not found"}), 404
+        with locked_upload(upload_folder(), upload_id) as upload:
+            if upload is not None:
+                abort_upload(upload_folder(), upload)
+        return jsonify({"message": "Upload cancelled"}), 200
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
 @routes.route("/download-file/<int:file_id>")
 @login_required
 def download_file(file_id):
@@ -493,12 +970,9 @@ def download_file(file_id):
         )
         return redirect(url_for("routes.view_cases"))
 
-    file_path = os.path.join(UPLOAD_FOLDER, case_file.filename)
-
-    if os.path.exists(file_path):
-        return send_file(
-            file_path, download_name=case_file.original_filename, as_attachment=True
-        )
+    response = serve_case_file(upload_folder(), case_file)
+    if response is not None:
+        return response
     else:
         flash("File not found", category="error")
         return redirect(url_for("routes.case_files", case_id=case_file.case_id))
@@ -518,14 +992,17 @@ def delete_file(file_id):
             )
             return redirect(url_for("routes.view_cases"))
 
-        file_path = os.path.join(UPLOAD_FOLDER, case_file.filename)
-
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
+        sha256 = case_file.sha256
+        if sha256:
+            release_blob_reference(upload_folder(), sha256)
         db.session.delete(case_file)
         db.session.commit()
 
+        if not sha256:
+            file_path = os.path.join(upload_folder(), case_file.filename)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
         flash("File deleted successfully!", category="success")
         return redirect(url_for("routes.case_files", case_id=case_file.case_id))
     except Exception as e:
@@ -535,10 +1012,16 @@ def delete_file(file_id):
 
 @routes.route("/view-courts", methods=["GET", "POST"])
 @login_required
+@versioned_listing("courts")
 def view_courts():
     try:
-        courts = Court.query.all()
-        return render_template("view-courts.html", user=current_user, courts=courts)
+        listing = cached_fragment(
+            "courts-listing.html",
+            ("courts",),
+            lambda: {"user": current_user, "courts": Court.query.all()},
+            per_user=False,
+        )
+        return render_template("view-courts.html", user=current_user, listing=listing)
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
@@ -567,22 +1050,13 @@ def search_courts():
 def new_court():
     try:
         if request.method == "POST":
-            title = request.form.get("title")
-            address = request.form.get("address")
-            court = Court.query.filter_by(title=title).first()
-            if (
-                not title
-                or not is_valid_range(title, 100)
-                or has_sql_injection(title)
-                or not address
-                or not is_valid_range(address, 100)
-                or has_sql_injection(address)
-            ):
+            values, errors = COURT_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
-            elif court:
+            elif Court.query.filter_by(title=values["title"]).first():
                 flash("Court already exists!", category="error")
             else:
-                new_court = Court(title=title, address=address)
+                new_court = Court(**values)
                 db.session.add(new_court)
                 db.session.commit()
                 flash("Court created!", category="success")
@@ -600,20 +1074,13 @@ def edit_court(id):
         if not court:
             return redirect(url_for("routes.home"))
         if request.method == "POST":
-            title = request.form.get("title")
-            address = request.form.get("address")
-            if (
-                not title
-                or not is_valid_range(title, 100)
-                or has_sql_injection(title)
-                or not address
-                or not is_valid_range(address, 100)
-                or has_sql_injection(address)
-            ):
+            values, errors = COURT_SCHEMA.validate(request.form)
+            if errors:
                 flash("Invalid form.", category="error")
             else:
-                court.title = title
-                court.address = address
+                court.title = values["title"]
+                court.address = values["address"]
+                propagate_court(court)
                 db.session.commit()
                 flash("Court edited!", category="success")
                 return redirect(url_for("routes.home"))
@@ -659,7 +1126,7 @@ def delete_court():
 def storage_info():
     """Get storage statistics"""
     try:
-        stats = get_storage_stats(UPLOAD_FOLDER)
+        stats = get_storage_stats()
         return jsonify(stats), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,98 @@
+import os
+from datetime import date, timedelta
+from itertools import groupby
+
+from sqlalchemy import select
+
+from .models import Note
+
+
+CALENDAR_DEFAULT_DAYS = int(os.getenv("CALENDAR_DEFAULT_DAYS", 7))
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", 92))
+
+CALENDAR_COLUMNS = (
+    Note.id,
+    Note.date,
+    Note.time,
+    Note.status,
+    Note.details,
+    Note.case_id,
+    Note.case_title,
+    Note.client_name,
+    Note.court_id,
+    Note.court_name,
+    Note.court_address,
+    Note.creator_id,
+)
+
+FILTER_COLUMNS = {
+    "court_id": Note.court_id,
+    "case_id": Note.case_id,
+    "creator_id": Note.creator_id,
+    "status": Note.status,
+}
+
+
+def calendar_today():
+    """The day a calendar without 'from' starts on"""
+    return date.today()
+
+
+def calendar_range(values):
+    """
+    Resolve the requested [from, to] range, defaulting to a week from
+    today. Raises ValueError for reversed or overlong ranges.
+    """
+    start = values["from"] or calendar_today()
+    end = values["to"] or start + timedelta(days=CALENDAR_DEFAULT_DAYS - 1)
+    if end < start:
+        raise ValueError("'to' is before 'from'")
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValueError(f"Range is limited to {CALENDAR_MAX_DAYS} days")
+    return start, end
+
+
+def calendar_query(start, end, values):
+    """
+    Hearings between start and end inclusive. Every filter is an equality
+    that leads one of the (x, date, time) note indexes, so the plan is a
+    single range seek in (date, time) order.
+    """
+    query = (
+        select(*CALENDAR_COLUMNS)
+        .where(Note.date >= start, Note.date <= end)
+        .order_by(Note.date, Note.time, Note.id)
+    )
+    for name, column in FILTER_COLUMNS.items():
+        if values.get(name) is not None:
+            query = query.where(column == values[name])
+    return query
+
+
+def group_by_day(rows):
+    return [
+        {
+            "date": day.isoformat(),
+            "hearings": [
+                {
+                    "id": row.id,
+                    "time": row.time.strftime("%H:%M"),
+                    "status": row.status,
+                    "details": row.details,
+                    "case": {
+                        "id": row.case_id,
+                        "title": row.case_title,
+                        "client": row.client_name,
+                    },
+                    "court": {
+                        "id": row.court_id,
+                        "title": row.court_name,
+                        "address": row.court_address,
+                    },
+                    "creator_id": row.creator_id,
+                }
+                for row in day_rows
+            ],
+        }
+        for day, day_rows in groupby(rows, key=lambda row: row.date)
+    ]
@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import SQL_QUERY_SECONDS
+
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+def _active_counters():
+    if not hasattr(_local, "counters"):
+        _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    SQL_QUERY_SECONDS.observe(elapsed)
+    for counter in _active_counters():
+        counter.count += 1
+        counter.duration += elapsed
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed by the current thread inside the block"""
+    counter = QueryCounter()
+    counters = _active_counters()
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail with QueryBudgetExceeded if the block runs more than max_queries"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{counter.count} queries executed, budget is {max_queries}"
+        )
+
+
+def init_query_counter(app):
+    """
+    Count queries per request, log them and report them in the
+    X-Query-Count / X-Query-Time headers. When SQL_QUERY_BUDGET is set, a
+    request over budget raises QueryBudgetExceeded in testing mode and is
+    logged as a warning otherwise.
+    """
+
+    @app.before_request
+    def start_query_counter():
+        g.query_counter = QueryCounter()
+        _active_counters().append(g.query_counter)
+
+    @app.after_request
+    def report_query_counter(response):
+        counter = g.pop("query_counter", None)
+        if counter is None:
+            return response
+        _active_counters().remove(counter)
+
+        response.headers["X-Query-Count"] = str(counter.count)
+        response.headers["X-Query-Time"] = f"{counter.duration_ms:.2f}ms"
+        app.logger.info(
+            "%s %s: %d queries in %.2fms",
+            request.method,
+            request.path,
+            counter.count,
+            counter.duration_ms,
+        )
+
+        budget = app.config.get("SQL_QUERY_BUDGET")
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.endpoint} executed {counter.count} queries, "
+                f"budget is {budget}"
+            )
+            if app.testing:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
+
+    @app.teardown_request
+    def discard_query_counter(exc):
+        counter = g.pop("query_counter", None)
+        if counter is not None and counter in _active_counters():
+            _active_counters().remove(counter)
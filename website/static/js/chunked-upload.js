@@ -0,0 +1,120 @@
+// Загрузка файлов частями с возможностью продолжить после обрыва соединения
+
+/**
+ * Key under which an unfinished upload of this file is remembered
+ * @param {number} caseId - Case the file is uploaded to
+ * @param {File} file - Selected file
+ * @returns {string}
+ */
+function uploadStorageKey(caseId, file) {
+    return ["upload", caseId, file.name, file.size, file.lastModified].join(":");
+}
+
+/**
+ * Create a new upload session or resume a remembered one
+ * @returns {Promise<{upload_id: string, offset: number, chunk_size: number}>}
+ */
+function openUploadSession(caseId, file) {
+    var key = uploadStorageKey(caseId, file);
+    var uploadId = localStorage.getItem(key);
+
+    function create() {
+        return fetch("/upload-session/" + caseId, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ filename: file.name, size: file.size }),
+        }).then(function(response) {
+            return response.json().then(function(data) {
+                if (!response.ok) {
+                    throw new Error(data.error || "Failed to start the upload.");
+                }
+                localStorage.setItem(key, data.upload_id);
+                return data;
+            });
+        });
+    }
+
+    if (!uploadId) {
+        return create();
+    }
+    return fetch("/upload-session/" + uploadId).then(function(response) {
+        if (!response.ok) {
+            localStorage.removeItem(key);
+            return create();
+        }
+        return response.json();
+    });
+}
+
+/**
+ * Send the file chunk by chunk starting from the offset the server reports
+ * @param {number} caseId - Case the file is uploaded to
+ * @param {File} file - Selected file
+ * @param {function(number)} onProgress - Called with the number of bytes stored
+ * @returns {Promise<Object>} - Response of the final chunk
+ */
+function uploadFileInChunks(caseId, file, onProgress) {
+    var key = uploadStorageKey(caseId, file);
+
+    return openUploadSession(caseId, file).then(function(session) {
+        function sendFrom(offset) {
+            onProgress(offset);
+            var chunk = file.slice(offset, offset + session.chunk_size);
+            return fetch("/upload-session/" + session.upload_id, {
+                method: "PUT",
+                headers: {
+                    "Content-Type": "application/octet-stream",
+                    "Upload-Offset": String(offset),
+                },
+                body: chunk,
+            }).then(function(response) {
+                return response.json().then(function(data) {
+                    if (response.status === 409) {
+                        return sendFrom(data.offset);
+                    }
+                    if (!response.ok) {
+                        throw new Error(data.error || "Upload failed.");
+                    }
+                    if (response.status === 201) {
+                        localStorage.removeItem(key);
+                        onProgress(file.size);
+                        return data;
+                    }
+                    return sendFrom(data.offset);
+                });
+            });
+        }
+        return sendFrom(session.offset);
+    });
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    var form = document.querySelector("form[data-chunked-upload]");
+    if (!form || !window.fetch || !window.Blob) {
+        return;
+    }
+    var caseId = form.getAttribute("data-chunked-upload");
+    var progress = form.querySelector(".progress");
+    var progressBar = form.querySelector(".progress-bar");
+
+    form.addEventListener("submit", function(event) {
+        var file = form.querySelector("input[type=file]").files[0];
+        if (!file) {
+            return;
+        }
+        event.preventDefault();
+        progress.classList.remove("d-none");
+
+        uploadFileInChunks(caseId, file, function(sent) {
+            var percent = file.size ? Math.floor((sent / file.size) * 100) : 100;
+            progressBar.style.width = percent + "%";
+            progressBar.textContent = percent + "%";
+        })
+            .then(function(data) {
+                window.location.href = data.redirect;
+            })
+            .catch(function(error) {
+                alert(error.message + " Submit again to resume the upload.");
+            });
+    });
+});
@@ -143,6 +143,97 @@ function deleteNote(button) {
     }
 }
 
+/**
+ * IDs of the notes ticked in the schedule table
+ * @returns {number[]}
+ */
+function selectedNoteIds() {
+    return Array.from(document.querySelectorAll(".note-select:checked")).map(
+        function(checkbox) {
+            return Number(checkbox.value);
+        }
+    );
+}
+
+/**
+ * Show the selection count and enable the bulk buttons when anything is ticked
+ */
+function updateBulkNoteActions() {
+    var count = selectedNoteIds().length;
+    var label = document.getElementById("bulk-note-count");
+    if (label) {
+        label.textContent = count + " selected";
+    }
+    document.querySelectorAll(".bulk-note-action").forEach(function(button) {
+        button.disabled = count === 0;
+    });
+}
+
+/**
+ * Tick or untick every selectable note on the page
+ * @param {HTMLInputElement} checkbox - The select-all checkbox
+ */
+function toggleAllNotes(checkbox) {
+    document.querySelectorAll(".note-select").forEach(function(item) {
+        item.checked = checkbox.checked;
+    });
+    updateBulkNoteActions();
+}
+
+/**
+ * Send the selected note IDs to a bulk endpoint and reload the page
+ * @param {string} url - Bulk endpoint
+ * @param {Object} payload - Extra fields of the request body
+ * @param {string} failure - Message shown when the request fails
+ */
+function sendBulkNoteRequest(url, payload, failure) {
+    payload.ids = selectedNoteIds();
+    fetch(url, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify(payload),
+    })
+    .then((response) => {
+        return response.json().then((data) => {
+            if (!response.ok) {
+                alert(data.error || failure);
+                return;
+            }
+            if (data.skipped.length) {
+                alert("Skipped notes: " + data.skipped.join(", "));
+            }
+            window.location.reload();
+        });
+    })
+    .catch((error) => {
+        alert(failure);
+    });
+}
+
+/**
+ * Set the status chosen in the toolbar on every selected note
+ */
+function bulkUpdateNoteStatus() {
+    var status = document.getElementById("bulk-note-status").value;
+    sendBulkNoteRequest(
+        "/notes/bulk-status",
+        { status: status },
+        "Failed to update the notes."
+    );
+}
+
+/**
+ * Delete every selected note
+ */
+function bulkDeleteNotes() {
+    var count = selectedNoteIds().length;
+    if (confirm("Are you sure you want to delete " + count + " notes?")) {
+        sendBulkNoteRequest("/notes/bulk-delete", {}, "Failed to delete the notes.");
+    }
+}
+
 /**
  * Validate login form
  * @returns {boolean} - True if valid, false otherwise
@@ -315,4 +406,74 @@ function deleteUser(button) {
             alert("Failed to delete the user.");
         });
     }
-}
\ No newline at end of file
+}
+
+/**
+ * Turn a search input into an on-demand picker for the <select> it targets.
+ * Options are fetched page by page from the input's data-lookup-url, so the
+ * form never renders the full list of cases or courts.
+ * @param {HTMLInputElement} input - Input with data-lookup-url and data-lookup-target
+ */
+function initLookupSelect(input) {
+    var select = document.getElementById(input.getAttribute("data-lookup-target"));
+    var url = input.getAttribute("data-lookup-url");
+    var nextCursor = null;
+    var timer = null;
+
+    var moreButton = document.createElement("button");
+    moreButton.type = "button";
+    moreButton.className = "btn btn-sm btn-link d-none";
+    moreButton.textContent = "Load more";
+    select.parentNode.appendChild(moreButton);
+
+    function optionLabel(item) {
+        if (item.full_name) {
+            return item.title + " — " + item.full_name + " (" + item.phone + ")";
+        }
+        return item.title;
+    }
+
+    function load(append) {
+        var params = new URLSearchParams({ q: input.value.trim() });
+        if (append && nextCursor) {
+            params.set("after", nextCursor);
+        }
+        fetch(url + "?" + params.toString())
+            .then(function(response) {
+                return response.json();
+            })
+            .then(function(data) {
+                if (!append) {
+                    select.innerHTML = "";
+                }
+                data.results.forEach(function(item) {
+                    var option = document.createElement("option");
+                    option.value = item.id;
+                    option.textContent = optionLabel(item);
+                    select.appendChild(option);
+                });
+                nextCursor = data.next;
+                moreButton.classList.toggle("d-none", !nextCursor);
+            })
+            .catch(function(error) {
+                console.error("Lookup failed:", error);
+            });
+    }
+
+    input.addEventListener("input", function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            load(false);
+        }, 250);
+    });
+    if (select.options.length === 0) {
+        load(false);
+    }
+    moreButton.addEventListener("click", function() {
+        load(true);
+    });
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    document.querySelectorAll("[data-lookup-url]").forEach(initLookupSelect);
+});
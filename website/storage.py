@@ -0,0 +1,162 @@
+import os
+import time
+from datetime import datetime
+
+import click
+from sqlalchemy import event, func, select
+
+from . import db
+from .background import register_job
+from .models import Blob, CaseFile, StorageUsage
+from .utils import STORAGE_LIMIT, get_directory_size
+
+
+STORAGE_USAGE_ID = 1
+STORAGE_RECONCILE_INTERVAL = int(os.getenv("STORAGE_RECONCILE_INTERVAL", 6 * 60 * 60))
+
+storage_usage = StorageUsage.__table__
+
+
+def _adjust_usage(connection, byte_delta, file_delta, physical_delta):
+    connection.execute(
+        storage_usage.update()
+        .where(storage_usage.c.id == STORAGE_USAGE_ID)
+        .values(
+            used_bytes=storage_usage.c.used_bytes + byte_delta,
+            file_count=storage_usage.c.file_count + file_delta,
+            physical_bytes=storage_usage.c.physical_bytes + physical_delta,
+        )
+    )
+
+
+def adjust_physical_usage(connection, byte_delta):
+    """Account for a blob being stored or removed"""
+    _adjust_usage(connection, 0, 0, byte_delta)
+
+
+# The counter is adjusted on the same connection that writes the case_files
+# row, so it commits or rolls back together with the file record. Files
+# backed by a shared blob only add logical usage; the blob accounts for its
+# physical bytes once, however many rows reference it.
+@event.listens_for(CaseFile, "after_insert")
+def _count_inserted_file(mapper, connection, target):
+    physical = target.file_size if target.sha256 is None else 0
+    _adjust_usage(connection, target.file_size, 1, physical)
+
+
+@event.listens_for(CaseFile, "after_delete")
+def _count_deleted_file(mapper, connection, target):
+    physical = target.file_size if target.sha256 is None else 0
+    _adjust_usage(connection, -target.file_size, -1, -physical)
+
+
+def get_storage_stats():
+    """Get storage statistics from the persisted usage counter"""
+    usage = db.session.get(StorageUsage, STORAGE_USAGE_ID)
+    used_space = usage.physical_bytes if usage else 0
+    free_space = STORAGE_LIMIT - used_space
+    return {
+        "total": STORAGE_LIMIT,
+        "used": used_space,
+        "free": free_space,
+        "usage_percent": (used_space / STORAGE_LIMIT) * 100,
+        "logical": usage.used_bytes if usage else 0,
+        "files": usage.file_count if usage else 0,
+    }
+
+
+def is_storage_available(file_size):
+    """Check if there's enough storage space for new file"""
+    return get_storage_stats()["free"] >= file_size
+
+
+def _read_usage(connection):
+    return connection.execute(
+        select(storage_usage.c.physical_bytes, storage_usage.c.file_count).where(
+            storage_usage.c.id == STORAGE_USAGE_ID
+        )
+    ).first()
+
+
+def reconcile_storage_usage():
+    """
+    Recompute the counter from case_files and blobs in a single statement
+    and return the (physical byte, file) drift that was corrected.
+    """
+    legacy_bytes = (
+        select(func.coalesce(func.sum(CaseFile.file_size), 0))
+        .where(CaseFile.sha256.is_(None))
+        .scalar_subquery()
+    )
+    blob_bytes = select(func.coalesce(func.sum(Blob.size), 0)).scalar_subquery()
+    totals = dict(
+        used_bytes=select(
+            func.coalesce(func.sum(CaseFile.file_size), 0)
+        ).scalar_subquery(),
+        physical_bytes=legacy_bytes + blob_bytes,
+        file_count=select(func.count(CaseFile.id)).scalar_subquery(),
+        reconciled_at=datetime.utcnow(),
+    )
+    with db.engine.begin() as connection:
+        before = _read_usage(connection)
+        if before is None:
+            connection.execute(
+                storage_usage.insert().values(id=STORAGE_USAGE_ID, **totals)
+            )
+            before_bytes, before_files = 0, 0
+        else:
+            connection.execute(
+                storage_usage.update()
+                .where(storage_usage.c.id == STORAGE_USAGE_ID)
+                .values(**totals)
+            )
+            before_bytes, before_files = before
+        after = _read_usage(connection)
+    return after.physical_bytes - before_bytes, after.file_count - before_files
+
+
+def _reconcile_periodically(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                byte_drift, file_drift = reconcile_storage_usage()
+            if byte_drift or file_drift:
+                app.logger.warning(
+                    "Storage counter drift corrected: %+d bytes, %+d files",
+                    byte_drift,
+                    file_drift,
+                )
+        except Exception as e:
+            app.logger.error("Storage reconciliation failed: %s", e)
+
+
+def init_storage(app, upload_folder):
+    os.makedirs(upload_folder, exist_ok=True)
+    with app.app_context():
+        if db.session.get(StorageUsage, STORAGE_USAGE_ID) is None:
+            reconcile_storage_usage()
+        db.session.remove()
+
+    if STORAGE_RECONCILE_INTERVAL > 0:
+        register_job(
+            app,
+            "storage-reconcile",
+            _reconcile_periodically,
+            app,
+            STORAGE_RECONCILE_INTERVAL,
+        )
+
+    @app.cli.command("reconcile-storage")
+    def reconcile_storage():
+        """Resync the storage counter with case_files and report orphans."""
+        byte_drift, file_drift = reconcile_storage_usage()
+        click.echo(
+            f"Counter corrected by {byte_drift:+d} bytes, {file_drift:+d} files."
+        )
+        stats = get_storage_stats()
+        on_disk = get_directory_size(upload_folder)
+        click.echo(
+            f"Tracked: {stats['logical']} bytes in {stats['files']} files, "
+            f"{stats['used']} bytes stored; on disk: {on_disk} bytes."
+        )
@@ -0,0 +1,155 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, select
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import LoginAttempt
+
+
+LOGIN_WINDOW = int(os.getenv("LOGIN_WINDOW", 300))
+LOGIN_MAX_PER_IP = int(os.getenv("LOGIN_MAX_PER_IP", 20))
+LOGIN_MAX_PER_USER = int(os.getenv("LOGIN_MAX_PER_USER", 5))
+LOGIN_MAX_CONCURRENT_HASHES = int(os.getenv("LOGIN_MAX_CONCURRENT_HASHES", 2))
+LOGIN_HASH_WAIT = float(os.getenv("LOGIN_HASH_WAIT", 2))
+
+# Expired rows are swept after this many recorded failures in a process.
+PURGE_EVERY = 100
+
+attempts = LoginAttempt.__table__
+
+# scrypt is deliberately expensive; bound how many verifications one worker
+# runs at once so a burst of logins cannot take every thread.
+_hash_slots = threading.BoundedSemaphore(LOGIN_MAX_CONCURRENT_HASHES)
+
+# key -> (window_start, failures) as last seen in the shared table. A key
+# this process already knows to be blocked is rejected without a query.
+_local_counts = {}
+_local_lock = threading.Lock()
+_failures_since_purge = 0
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Too many failed login attempts")
+        self.retry_after = max(int(retry_after), 1)
+
+
+class LoginBusy(Exception):
+    pass
+
+
+def _keys(ip, username):
+    return (
+        (f"ip:{ip}", LOGIN_MAX_PER_IP),
+        (f"user:{username.lower()}", LOGIN_MAX_PER_USER),
+    )
+
+
+def _remaining(window_start, now):
+    return LOGIN_WINDOW - (now - window_start).total_seconds()
+
+
+def _check(key, limit, window_start, failures, now):
+    if failures >= limit and _remaining(window_start, now) > 0:
+        raise LoginThrottled(_remaining(window_start, now))
+
+
+def check_login_allowed(ip, username):
+    """
+    Raise LoginThrottled when the client IP or the username has used up its
+    failed attempts for the current window. Called before the user lookup
+    and the password hash, so throttled requests cost almost nothing.
+    """
+    now = datetime.utcnow()
+    keys = _keys(ip, username)
+    with _local_lock:
+        for key, limit in keys:
+            if key in _local_counts:
+                _check(key, limit, *_local_counts[key], now)
+
+    rows = db.session.execute(
+        select(attempts.c.key, attempts.c.window_start, attempts.c.failures).where(
+            attempts.c.key.in_([key for key, _ in keys])
+        )
+    ).all()
+    counts = {row.key: (row.window_start, row.failures) for row in rows}
+    with _local_lock:
+        _local_counts.update(counts)
+    for key, limit in keys:
+        if key in counts:
+            _check(key, limit, *counts[key], now)
+
+
+def _increment(connection, key, now):
+    expired = attempts.c.window_start < now - timedelta(seconds=LOGIN_WINDOW)
+    updated = connection.execute(
+        attempts.update()
+        .where(attempts.c.key == key)
+        .values(
+            failures=case((expired, 1), else_=attempts.c.failures + 1),
+            window_start=case((expired, now), else_=attempts.c.window_start),
+        )
+    ).rowcount
+    if not updated:
+        connection.execute(
+            attempts.insert().values(key=key, failures=1, window_start=now)
+        )
+    return connection.execute(
+        select(attempts.c.window_start, attempts.c.failures).where(
+            attempts.c.key == key
+        )
+    ).first()
+
+
+def record_login_failure(ip, username):
+    global _failures_since_purge
+    now = datetime.utcnow()
+    for key, _ in _keys(ip, username):
+        try:
+            with db.engine.begin() as connection:
+                row = _increment(connection, key, now)
+        except IntegrityError:
+            # Another worker inserted the row first; count on top of it.
+            with db.engine.begin() as connection:
+                row = _increment(connection, key, now)
+        with _local_lock:
+            _local_counts[key] = (row.window_start, row.failures)
+
+    _failures_since_purge += 1
+    if _failures_since_purge >= PURGE_EVERY:
+        _failures_since_purge = 0
+        purge_login_attempts()
+
+
+def record_login_success(username):
+    """A successful login clears the username counter, not the IP one"""
+    key = f"user:{username.lower()}"
+    with db.engine.begin() as connection:
+        connection.execute(attempts.delete().where(attempts.c.key == key))
+    with _local_lock:
+        _local_counts.pop(key, None)
+
+
+def purge_login_attempts():
+    cutoff = datetime.utcnow() - timedelta(seconds=LOGIN_WINDOW)
+    with db.engine.begin() as connection:
+        connection.execute(attempts.delete().where(attempts.c.window_start < cutoff))
+    with _local_lock:
+        for key, (window_start, _) in list(_local_counts.items()):
+            if window_start < cutoff:
+                del _local_counts[key]
+
+
+@contextmanager
+def hash_slot():
+    """Hold one of this worker's password-hash slots, or raise LoginBusy"""
+    if not _hash_slots.acquire(timeout=LOGIN_HASH_WAIT):
+        raise LoginBusy()
+    try:
+        yield
+    finally:
+        _hash_slots.release()
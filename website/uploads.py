@@ -0,0 +1,251 @@
+import fcntl
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import click
+from werkzeug.utils import secure_filename
+
+from . import db
+from .models import CaseFile, UploadSession
+from .storage import get_storage_stats
+from .blobs import add_blob_reference
+from .metrics import UPLOAD_BYTES
+
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 512 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24)))
+
+STREAM_BUFFER_SIZE = 64 * 1024
+PARTIAL_DIR_NAME = ".partial"
+
+# Running SHA-256 of the sessions whose chunks this worker has seen from
+# the start. It is only a shortcut: a session whose chunks were spread over
+# workers is hashed in one pass over its file when it finishes, so hashing
+# stays linear in the file size whichever workers handle the chunks. The
+# cache is bounded, so entries of sessions finished elsewhere age out.
+HASHER_CACHE_SIZE = 32
+_hashers = OrderedDict()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def partial_path(upload_folder, upload_id):
+    return os.path.join(upload_folder, PARTIAL_DIR_NAME, f"{upload_id}.part")
+
+
+def lock_path(upload_folder, upload_id):
+    return os.path.join(upload_folder, PARTIAL_DIR_NAME, f"{upload_id}.lock")
+
+
+@contextmanager
+def locked_upload(upload_folder, upload_id):
+    """
+    Hold the upload's lock and yield its session as currently committed,
+    or None if it is gone. The lock is an flock, so it also serializes
+    chunks of one upload that reach different workers; the second request
+    waits, then sees the first one's offset and gets a 409.
+    """
+    path = lock_path(upload_folder, upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # End the read transaction so the session row is read afresh.
+            db.session.commit()
+            yield db.session.get(UploadSession, upload_id, populate_existing=True)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _remove_upload_files(upload_folder, upload_id):
+    for path in (
+        partial_path(upload_folder, upload_id),
+        lock_path(upload_folder, upload_id),
+    ):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def pending_upload_bytes(exclude_id=None):
+    """Bytes already accepted into unfinished upload sessions"""
+    query = db.session.query(
+        db.func.coalesce(db.func.sum(UploadSession.received_bytes), 0)
+    )
+    if exclude_id is not None:
+        query = query.filter(UploadSession.id != exclude_id)
+    return query.scalar()
+
+
+def create_upload_session(upload_folder, case_id, user_id, filename, total_size):
+    filename = secure_filename(filename or "")
+    if not filename:
+        raise UploadError("No selected file")
+    if total_size <= 0 or total_size > MAX_UPLOAD_SIZE:
+        raise UploadError(
+            f"File size must be between 1 byte and {MAX_UPLOAD_SIZE} bytes"
+        )
+    if get_storage_stats()["free"] - pending_upload_bytes() < total_size:
+        raise UploadError("Not enough storage space", status=413)
+
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        case_id=case_id,
+        creator_id=user_id,
+        original_filename=filename,
+        total_size=total_size,
+        received_bytes=0,
+    )
+    os.makedirs(os.path.dirname(partial_path(upload_folder, upload.id)), exist_ok=True)
+    open(partial_path(upload_folder, upload.id), "wb").close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def _cached_hasher(upload_id, offset):
+    """This worker's running hash of the upload if it covers exactly `offset`"""
+    if offset == 0:
+        return hashlib.sha256()
+    cached = _hashers.pop(upload_id, None)
+    if cached is None or cached[1] != offset:
+        return None
+    return cached[0]
+
+
+def _remember_hasher(upload_id, sha256, offset):
+    _hashers[upload_id] = (sha256, offset)
+    while len(_hashers) > HASHER_CACHE_SIZE:
+        _hashers.popitem(last=False)
+
+
+def _hash_file(path, size):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as partial:
+        remaining = size
+        while remaining > 0:
+            block = partial.read(min(STREAM_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            sha256.update(block)
+            remaining -= len(block)
+    return sha256
+
+
+def write_chunk(upload_folder, upload, offset, stream, content_length):
+    """
+    Append one chunk read from `stream` at `offset`.
+
+    The chunk is copied to the partial file in small blocks while the
+    running SHA-256 is updated, and the quota is checked against the bytes
+    actually received, so nothing is buffered beyond STREAM_BUFFER_SIZE.
+    Call it under locked_upload() with the session that yielded.
+    """
+    if offset != upload.received_bytes:
+        raise UploadError("Offset mismatch", status=409, offset=upload.received_bytes)
+    if content_length is None or content_length > UPLOAD_CHUNK_SIZE:
+        raise UploadError(
+            f"Chunks must declare a length up to {UPLOAD_CHUNK_SIZE} bytes"
+        )
+    if offset + content_length > upload.total_size:
+        raise UploadError("Chunk exceeds the declared file size", status=413)
+
+    free_space = get_storage_stats()["free"] - pending_upload_bytes(
+        exclude_id=upload.id
+    )
+    hasher = _cached_hasher(upload.id, offset)
+    written = 0
+    path = partial_path(upload_folder, upload.id)
+    try:
+        with open(path, "r+b") as partial:
+            partial.seek(offset)
+            partial.truncate()
+            while True:
+                block = stream.read(min(STREAM_BUFFER_SIZE, content_length - written))
+                if not block:
+                    break
+                written += len(block)
+                if offset + written > free_space:
+                    raise UploadError(
+                        "Not enough storage space", status=413, offset=offset
+                    )
+                partial.write(block)
+                if hasher is not None:
+                    hasher.update(block)
+    except BaseException:
+        # Drop the half-written chunk so the client can resend it.
+        with open(path, "r+b") as partial:
+            partial.truncate(offset)
+        raise
+
+    if written != content_length:
+        with open(path, "r+b") as partial:
+            partial.truncate(offset)
+        raise UploadError("Incomplete chunk", status=400, offset=offset)
+
+    UPLOAD_BYTES.labels("chunked").inc(written)
+    if hasher is not None:
+        _remember_hasher(upload.id, hasher, offset + written)
+    upload.received_bytes = offset + written
+    upload.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def finish_upload(upload_folder, upload, expected_sha256=None):
+    """Move a completed upload into the blob store and record it as a CaseFile"""
+    path = partial_path(upload_folder, upload.id)
+    hasher = _cached_hasher(upload.id, upload.total_size)
+    if hasher is None:
+        hasher = _hash_file(path, upload.total_size)
+    checksum = hasher.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != checksum:
+        abort_upload(upload_folder, upload)
+        raise UploadError("Checksum mismatch", status=422)
+
+    stored_path = add_blob_reference(
+        upload_folder,
+        path,
+        checksum,
+        upload.total_size,
+    )
+    case_file = CaseFile(
+        filename=stored_path,
+        original_filename=upload.original_filename,
+        file_size=upload.total_size,
+        case_id=upload.case_id,
+        sha256=checksum,
+    )
+    db.session.add(case_file)
+    db.session.delete(upload)
+    db.session.commit()
+    _remove_upload_files(upload_folder, upload.id)
+    return case_file, checksum
+
+
+def abort_upload(upload_folder, upload):
+    _hashers.pop(upload.id, None)
+    db.session.delete(upload)
+    db.session.commit()
+    _remove_upload_files(upload_folder, upload.id)
+
+
+def init_uploads(app, upload_folder):
+    @app.cli.command("purge-upload-sessions")
+    def purge_upload_sessions():
+        """Delete upload sessions idle for longer than UPLOAD_SESSION_TTL_HOURS."""
+        cutoff = datetime.utcnow() - UPLOAD_SESSION_TTL
+        stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+        for upload in stale:
+            with locked_upload(upload_folder, upload.id) as current:
+                if current is not None:
+                    abort_upload(upload_folder, current)
+        click.echo(f"Removed {len(stale)} stale upload sessions.")
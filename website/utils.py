@@ -2,16 +2,12 @@ import random
 import string
 from datetime import datetime
 import os
-from dotenv import load_dotenv
 import re
 from functools import wraps
 from flask import redirect, url_for, flash
 from flask_login import current_user
 
 
-load_dotenv()
-
-
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 8 * 1024 * 1024))
 STORAGE_LIMIT = int(os.getenv("STORAGE_LIMIT", 30 * 1024 * 1024 * 1024))
 
@@ -88,9 +84,32 @@ SQL_PATTERNS = [
 ]
 
 
+# SQL_PATTERNS regrouped so most strings are cleared by substring checks.
+# The quote and comment patterns cannot match without one of their marker
+# characters; "UNION SELECT" is covered by the keyword pattern, whose
+# alternatives are factored and gated on their first letter.
+_SQL_QUOTE_RE = re.compile(
+    "|".join(f"(?:{pattern[4:]})" for pattern in SQL_PATTERNS[:4]), re.IGNORECASE
+)
+_SQL_COMMENT_RE = re.compile(r"/\*.*?\*/|;\s*$|--")
+_SQL_KEYWORD_RE = re.compile(
+    r"(?=[acdeimsu])"
+    r"(?:ALTER|CREATE|D(?:ELETE|ROP)|EXEC|INSERT|MERGE|SELECT|U(?:PDATE|NION))",
+    re.IGNORECASE,
+)
+
+
 def has_sql_injection(input_string):
     """Проверяет строку на наличие паттернов SQL-инъекций"""
-    return any(re.search(pattern, input_string) for pattern in SQL_PATTERNS)
+    if ("'" in input_string or "=" in input_string or "%" in input_string) and (
+        _SQL_QUOTE_RE.search(input_string)
+    ):
+        return True
+    if (
+        "/*" in input_string or ";" in input_string or "--" in input_string
+    ) and _SQL_COMMENT_RE.search(input_string):
+        return True
+    return _SQL_KEYWORD_RE.search(input_string) is not None
 
 
 def is_number(value):
@@ -123,6 +142,9 @@ def is_valid_time(time_str):
             return False
 
 
+EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+
+
 def is_valid_email(email):
     """
     Проверяет, что строка соответствует формату email
@@ -133,16 +155,20 @@ def is_valid_email(email):
     Returns:
         bool: True если формат корректный, False в противном случае
     """
-    email_pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-    return bool(re.match(email_pattern, email))
+    return bool(EMAIL_RE.match(email))
 
 
-def is_file_size_allowed(file, max_size):
-    """Check if file size is under the maximum allowed size"""
+def get_file_size(file):
+    """Return the size of an uploaded file and rewind it"""
     file.seek(0, 2)
     file_size = file.tell()
     file.seek(0)
-    return file_size <= max_size
+    return file_size
+
+
+def is_file_size_allowed(file, max_size):
+    """Check if file size is under the maximum allowed size"""
+    return get_file_size(file) <= max_size
 
 
 def get_directory_size(directory):
@@ -156,24 +182,6 @@ def get_directory_size(directory):
     return total_size
 
 
-def get_storage_stats(directory):
-    """Get storage statistics"""
-    used_space = get_directory_size(directory)
-    free_space = STORAGE_LIMIT - used_space
-    return {
-        "total": STORAGE_LIMIT,
-        "used": used_space,
-        "free": free_space,
-        "usage_percent": (used_space / STORAGE_LIMIT) * 100,
-    }
-
-
-def is_storage_available(directory, file_size):
-    """Check if there's enough storage space for new file"""
-    stats = get_storage_stats(directory)
-    return stats["free"] >= file_size
-
-
 def admin_required(func):
     @wraps(func)
     def decorated_view(*args, **kwargs):
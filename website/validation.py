@@ -0,0 +1,142 @@
+import re
+from datetime import date, time
+
+from .utils import EMAIL_RE, has_sql_injection
+
+
+DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+INT_RE = re.compile(r"^\d+$")
+TEXT_KINDS = ("str", "email")
+
+
+class Field:
+    """
+    Declarative spec for one form field.
+
+    kind is one of "str", "int", "date", "time", "choice" or "email". Text
+    kinds are checked against max_length and, unless check_sql is False,
+    the SQL injection matcher. Parsed values are returned typed, so routes
+    never parse the same string twice.
+    """
+
+    def __init__(
+        self,
+        name,
+        kind="str",
+        required=True,
+        max_length=None,
+        check_sql=True,
+        choices=None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        # Parsed kinds are matched against their own strict pattern instead.
+        self.check_sql = check_sql and kind in TEXT_KINDS
+        self.choices = frozenset(choices or ())
+        self._coerce = getattr(self, f"_coerce_{kind}")
+
+    def _coerce_str(self, value):
+        return value
+
+    def _coerce_email(self, value):
+        if not EMAIL_RE.match(value):
+            raise ValueError("invalid email")
+        return value
+
+    def _coerce_int(self, value):
+        if not INT_RE.match(value):
+            raise ValueError("not a number")
+        return int(value)
+
+    def _coerce_choice(self, value):
+        if value not in self.choices:
+            raise ValueError("unknown choice")
+        return value
+
+    def _coerce_date(self, value):
+        match = DATE_RE.match(value)
+        if not match:
+            raise ValueError("invalid date")
+        return date(*map(int, match.groups()))
+
+    def _coerce_time(self, value):
+        match = TIME_RE.match(value)
+        if not match:
+            raise ValueError("invalid time")
+        hour, minute, second = match.groups()
+        return time(int(hour), int(minute), int(second or 0))
+
+    def clean(self, value):
+        if not value:
+            if self.required:
+                raise ValueError("required")
+            return None
+        if self.max_length is not None and len(value) > self.max_length:
+            raise ValueError("too long")
+        if self.check_sql and has_sql_injection(value):
+            raise ValueError("forbidden characters")
+        return self._coerce(value)
+
+
+class Schema:
+    def __init__(self, *fields):
+        self.fields = fields
+
+    def validate(self, form):
+        """
+        Return (values, errors): values maps every field name to its typed
+        value (None for empty optional fields), errors maps failing field
+        names to a short reason.
+        """
+        values = {}
+        errors = {}
+        for field in self.fields:
+            try:
+                values[field.name] = field.clean(form.get(field.name))
+            except ValueError as e:
+                errors[field.name] = str(e)
+        return values, errors
+
+
+NOTE_STATUSES = ("resolved", "pending", "rejected")
+
+CASE_SCHEMA = Schema(
+    Field("title", max_length=100),
+    Field("details", max_length=100),
+    Field("full_name", max_length=100),
+    Field("phone", max_length=20),
+)
+
+COURT_SCHEMA = Schema(
+    Field("title", max_length=100),
+    Field("address", max_length=100),
+)
+
+NOTE_SCHEMA = Schema(
+    Field("case_id", kind="int"),
+    Field("court_id", kind="int"),
+    Field("status", kind="choice", choices=NOTE_STATUSES),
+    Field("details", required=False, check_sql=False),
+    Field("date", kind="date"),
+    Field("time", kind="time"),
+)
+
+USER_SCHEMA = Schema(Field("email", kind="email", max_length=150))
+
+LOGIN_SCHEMA = Schema(Field("name"), Field("password"))
+
+SET_PASSWORD_SCHEMA = Schema(
+    Field("password", max_length=128), Field("confirm", max_length=128)
+)
+
+CALENDAR_SCHEMA = Schema(
+    Field("from", kind="date", required=False),
+    Field("to", kind="date", required=False),
+    Field("court_id", kind="int", required=False),
+    Field("case_id", kind="int", required=False),
+    Field("creator_id", kind="int", required=False),
+    Field("status", kind="choice", required=False, choices=NOTE_STATUSES),
+)
@@ -0,0 +1,138 @@
+import hashlib
+import os
+from functools import wraps
+from itertools import chain
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import TableVersion
+
+
+# Tables whose contents are shown on listing pages. Any write to one of
+# them bumps its counter in the same transaction.
+VERSIONED_TABLES = ("notes", "cases", "courts", "user", "email_outbox", "case_files")
+
+table_versions = TableVersion.__table__
+
+
+def bump_tables(connection, names):
+    names = sorted(set(names) & set(VERSIONED_TABLES))
+    if names:
+        connection.execute(
+            table_versions.update()
+            .where(table_versions.c.name.in_(names))
+            .values(version=table_versions.c.version + 1)
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    changed = chain(
+        session.new,
+        session.deleted,
+        (obj for obj in session.dirty if session.is_modified(obj)),
+    )
+    names = {obj.__table__.name for obj in changed if hasattr(obj, "__table__")}
+    bump_tables(session.connection(), names)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_tables(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements never reach the flush"""
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        table = getattr(orm_execute_state.statement, "table", None)
+        name = getattr(table, "name", None)
+        if name in VERSIONED_TABLES:
+            bump_tables(orm_execute_state.session.connection(), [name])
+
+
+def read_versions(names):
+    rows = db.session.execute(
+        select(table_versions.c.name, table_versions.c.version).where(
+            table_versions.c.name.in_(names)
+        )
+    ).all()
+    return dict(rows)
+
+
+def _templates_stamp(app):
+    """Changes whenever a deploy ships different templates"""
+    latest = 0
+    for folder, _, files in os.walk(os.path.join(app.root_path, "templates")):
+        for name in files:
+            latest = max(latest, os.stat(os.path.join(folder, name)).st_mtime_ns)
+    return str(latest)
+
+
+def listing_etag(tables, vary=None):
+    versions = read_versions(tables)
+    g.table_versions = versions
+    scope = f"{current_user.get_id()}:{int(bool(current_user.is_admin))}"
+    parts = [
+        current_app.extensions["templates_stamp"],
+        request.endpoint,
+        request.full_path,
+        scope,
+    ] + [f"{name}={versions.get(name, 0)}" for name in tables]
+    if vary is not None:
+        parts.append(str(vary()))
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def versioned_listing(*tables, vary=None):
+    """
+    Answer GET requests with a weak ETag built from the versions of
+    `tables`, the query string and the user's permission scope, and with
+    304 Not Modified when it matches If-None-Match. Checking costs one
+    small query; the view, its ORM queries and Jinja only run on a miss.
+    Views whose output also depends on something outside those tables,
+    such as the current date, pass it as the `vary` callable.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are part of the page, so render them.
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            etag = listing_etag(tables, vary)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def init_versions(app):
+    app.extensions["templates_stamp"] = _templates_stamp(app)
+    with app.app_context():
+        existing = set(db.session.execute(select(table_versions.c.name)).scalars())
+        for name in VERSIONED_TABLES:
+            if name in existing:
+                continue
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        table_versions.insert().values(name=name, version=0)
+                    )
+            except IntegrityError:
+                pass
+        db.session.remove()